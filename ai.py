@@ -0,0 +1,153 @@
+"""
+NPC decision engines.
+
+An engine picks the card an NPC plays and its targets from plain
+`core.CombatantState` objects, so it needs no database access:
+
+    engine.decide(actor, states, friends, foes) -> (cardstring, [target keys])
+
+`actor` is the deciding combatant's key, `states` maps keys to states and
+`friends`/`foes` are key lists (friends include the actor).  Engines are
+looked up by name with `get_engine`; NPCs choose theirs with `ai_engine`.
+"""
+import time
+from cardsystem import core, registry, stats
+from cardsystem.cache import LRUCache
+
+# Hard wall-clock budget of one LookaheadAI decision, in seconds.
+DECISION_BUDGET = 0.005
+
+
+def options(actor, state, friends, foes, max_targets=None):
+    """
+    List the (cardstring, targets) choices for the cards in state's hand,
+    targeting the way NPCs always have: single foes or friends for
+    attacks and buffs, everyone for 'Group' cards, the actor otherwise.
+    At most max_targets single targets are offered per card.
+    """
+    choices = []
+    seen = set()
+    for cardstring in state.zones.cards('card_hand'):
+        if cardstring in seen:
+            continue
+        seen.add(cardstring)
+        carddata = core.card(cardstring)
+        if carddata['Type'] in ('Attack', 'Debuff'):
+            pool = foes
+        elif carddata['Type'] in ('Heal', 'Buff'):
+            pool = friends
+        else:
+            choices.append((cardstring, [actor]))
+            continue
+        if not pool:
+            continue
+        if len(pool) == 1 or carddata.get('Target') == 'Group':
+            choices.append((cardstring, list(pool)))
+        else:
+            choices.extend((cardstring, [target]) for target in pool[:max_targets])
+    return choices
+
+
+def vitality(state):
+    """Heuristic worth of a combatant: health left, active modifiers and cards in play."""
+    health, maxhealth = core.get_stat(state, 'Health')
+    if health <= 0:
+        return -1.0
+    value = health / max(maxhealth, 1)
+    value += 0.05 * sum(values['Mod'] for values in state.stats.values()) / stats.BASE_STAT
+    value += 0.1 * state.zones.count('card_played')
+    return value
+
+
+def state_key(state):
+    """Hashable summary of everything about a combatant a one-turn resolution depends on."""
+    return (tuple((stat, values['Max'], values['Cur'], values['Mod']) for stat, values in state.stats.items()),
+            tuple(state.zones.ids('card_hand')),
+            tuple(state.zones.ids('card_played')))
+
+
+class StateMap(dict):
+    """A states mapping that builds each state with loader(key) on first access."""
+    def __init__(self, loader):
+        super(StateMap, self).__init__()
+        self.loader = loader
+
+    def __missing__(self, key):
+        state = self[key] = self.loader(key)
+        return state
+
+
+class FirstCardAI(object):
+    """Plays the first card in hand at the first valid target."""
+    def decide(self, actor, states, friends, foes):
+        choices = options(actor, states[actor], friends, foes)
+        return choices[0] if choices else (None, [])
+
+
+class LookaheadAI(object):
+    """
+    Resolves each choice one turn ahead with the core rules and plays the
+    one that leaves friends best off relative to foes.
+
+    Only the actor and the combatants a choice touches are simulated, and
+    only the first max_targets friends or foes are considered as single
+    targets, so the cost of a decision does not grow with the size of the
+    fight.
+    Scores are memoized by a key built from the simulated states, so a
+    repeated situation costs one lookup.  Once `budget` seconds have passed
+    no more choices are simulated and the best one scored so far is played
+    (the first choice if none was).
+    """
+    def __init__(self, budget=DECISION_BUDGET, max_targets=4, memo_size=8192):
+        self.budget = budget
+        self.max_targets = max_targets
+        self.memo = LRUCache(memo_size, version=lambda: registry.REGISTRY.version)
+        self.decisions = 0
+        self.timeouts = 0
+
+    def score(self, actor, states, choice, friends, foes):
+        cardstring, targets = choice
+        involved = {actor: states[actor]}
+        for target in targets:
+            involved[target] = states[target]
+        # keyed by situation, not by who is in it, so identical NPCs share entries
+        key = (cardstring, state_key(involved[actor]),
+               tuple((target == actor, target in friends, state_key(involved[target])) for target in targets))
+        score = self.memo.get(key)
+        if score is None:
+            after, events = core.resolve_turn(involved, {actor: [{'card': cardstring, 'targets': targets}]})
+            score = 0.0
+            for other, state in after.items():
+                if other in friends:
+                    score += vitality(state) - vitality(involved[other])
+                elif other in foes:
+                    score -= vitality(state) - vitality(involved[other])
+            self.memo.set(key, score)
+        return score
+
+    def decide(self, actor, states, friends, foes):
+        deadline = time.perf_counter() + self.budget
+        self.decisions += 1
+        choices = options(actor, states[actor], friends, foes, self.max_targets)
+        if len(choices) < 2:
+            return choices[0] if choices else (None, [])
+        friends, foes = set(friends), set(foes)
+        best, best_score = choices[0], None
+        for choice in choices:
+            if time.perf_counter() >= deadline:
+                self.timeouts += 1
+                break
+            score = self.score(actor, states, choice, friends, foes)
+            if best_score is None or score > best_score:
+                best, best_score = choice, score
+        return best
+
+
+ENGINES = {
+    'first': FirstCardAI(),
+    'lookahead': LookaheadAI(),
+}
+
+
+def get_engine(name):
+    return ENGINES.get(name) or ENGINES['lookahead']
@@ -0,0 +1,3 @@
+"""
+Benchmarks for the card system.  Each module documents how to run it.
+"""
@@ -0,0 +1,60 @@
+"""
+NPC decision engine benchmark.
+
+Builds a fight of many combatants with random hands from the Base set
+and times LookaheadAI decisions, first on a cold memo and then repeating
+the same situations.  Needs no database:
+
+    python -m cardsystem.benchmarks.bench_ai [combatants] [rounds]
+"""
+import random
+import sys
+import time
+from cardsystem import ai, catalog, core, stats
+from cardsystem.effects import EffectStore
+from cardsystem.zones import CardInterner, CardZones
+
+
+def make_fight(size, rng):
+    """Two sides of size // 2 combatants, each with a hand of 3 and a weapon in play."""
+    interner = CardInterner()
+    hands = catalog.index().query(Set='Base', Type='Attack') + catalog.index().query(Set='Base', Type='Defend')
+    weapons = catalog.index().query(Set='Base', Type='Weapon')
+    states = {}
+    for key in range(0, size):
+        zones = CardZones(interner=interner)
+        zones.set_cards('card_hand', rng.sample(hands, 3))
+        zones.set_cards('card_played', [rng.choice(weapons)])
+        states[key] = core.CombatantState(key, f'NPC {key}', stats.new_stats(), zones, EffectStore())
+    sides = (list(range(0, size, 2)), list(range(1, size, 2)))
+    return states, sides
+
+
+def time_decisions(engine, states, sides, rounds):
+    worst = 0.0
+    start = time.perf_counter()
+    for i in range(0, rounds):
+        for actor in states:
+            friends, foes = sides if actor % 2 == 0 else sides[::-1]
+            began = time.perf_counter()
+            engine.decide(actor, states, friends, foes)
+            worst = max(worst, time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+    return rounds * len(states) / elapsed, worst
+
+
+def run(size=300, rounds=5, seed=0):
+    states, sides = make_fight(size, random.Random(seed))
+    engine = ai.LookaheadAI()
+    cold, cold_worst = time_decisions(engine, states, sides, 1)
+    warm, warm_worst = time_decisions(engine, states, sides, rounds)
+    info = engine.memo.info()
+    print(f"{size} combatants, budget {engine.budget * 1000:.1f} ms")
+    print(f"  cold memo: {cold:,.0f} decisions/s, worst {cold_worst * 1000:.2f} ms")
+    print(f"  repeated:  {warm:,.0f} decisions/s, worst {warm_worst * 1000:.2f} ms")
+    print(f"  timeouts {engine.timeouts} of {engine.decisions}, memo hits {info['hits']} misses {info['misses']}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    run(*args)
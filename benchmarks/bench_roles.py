@@ -0,0 +1,41 @@
+"""
+Role check benchmark.
+
+Times get_role against the old `obj in NPC.objects.all()` check while the
+number of NPC objects grows.  It creates throwaway NPCs in the game
+database and deletes them again, so run it against a development database
+from the game directory:
+
+    evennia shell
+    >>> from cardsystem.benchmarks import bench_roles
+    >>> bench_roles.run()
+"""
+import time
+from evennia import create_object
+from cardsystem.typeclasses import NPC, get_role
+
+
+def per_call(func, repeat):
+    """Average seconds per call of func over repeat calls."""
+    start = time.perf_counter()
+    for i in range(0, repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(sizes=(10, 1000, 10000), repeat=20):
+    """Print microseconds per check for each NPC table size in sizes."""
+    npcs = []
+    try:
+        print(f"{'NPCs':>8} {'queryset us':>12} {'get_role us':>12}")
+        for size in sizes:
+            while len(npcs) < size:
+                npcs.append(create_object(NPC, key=f'bench npc {len(npcs)}'))
+            # the object looked for is the newest, so the queryset scan sees every row
+            target = npcs[-1]
+            queryset = per_call(lambda: target in NPC.objects.all(), repeat)
+            role = per_call(lambda: get_role(target), repeat * 1000)
+            print(f"{size:>8} {queryset * 1e6:>12.1f} {role * 1e6:>12.3f}")
+    finally:
+        for npc in npcs:
+            npc.delete()
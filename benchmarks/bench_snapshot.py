@@ -0,0 +1,100 @@
+"""
+Card catalog snapshot benchmark.
+
+Generates a synthetic catalog, writes it both as a cards.py-style Python
+literal and as a snapshot, then measures in fresh interpreters the load
+time and peak RSS of compiling the source catalog against memory-mapping
+the snapshot and looking up a few cards.  Numbers are relative to an
+interpreter that only imports the registry.  Needs no database:
+
+    python -m cardsystem.benchmarks.bench_snapshot [cards] [lookups]
+
+RSS is read from /proc where available and is otherwise the peak RSS of
+the resource module, so this runs on Unix only.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from cardsystem import snapshot
+
+RARITIES = ('Common', 'Uncommon', 'Rare')
+ELEMENTS = ('Neutral', 'Light', 'Dark', 'Fire', 'Earth', 'Water')
+
+# Run in a child interpreter with the mode, the file path and the lookup count as arguments.
+CHILD = '''
+import resource, sys, time
+start = time.perf_counter()
+from cardsystem import registry
+mode, path, lookups = sys.argv[1], sys.argv[2], int(sys.argv[3])
+if mode == 'source':
+    namespace = {}
+    with open(path) as source:
+        exec(compile(source.read(), path, 'exec'), namespace)
+    cards = registry.CardRegistry(namespace['CARDS'])
+elif mode == 'snapshot':
+    from cardsystem.snapshot import Snapshot
+    cards = Snapshot(path)
+if mode != 'baseline':
+    for cardstring in list(cards)[:lookups]:
+        cards.get(cardstring)
+seconds = time.perf_counter() - start
+try:
+    with open('/proc/self/status') as status:
+        rss = next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(seconds, rss, sys.platform)
+'''
+
+
+def synthetic_catalog(count):
+    """A {set: {rarity: {title: data}}} catalog of count cards; every other card inherits."""
+    cards = {}
+    for number in range(0, count):
+        setname = f'Set{number // 1000}'
+        rarity = RARITIES[number % len(RARITIES)]
+        carddata = {
+            'Element': ELEMENTS[number % len(ELEMENTS)],
+            'Type': 'Attack',
+            'Damage': 1 + number % 7,
+            'Strength': number % 3,
+            'Detail': f'Synthetic card number {number}, dealing DAMAGE damage.',
+        }
+        if number % 2:
+            previous = number - 1
+            carddata = {'Inherits': f'{setname}_{RARITIES[previous % len(RARITIES)]}_Card {previous}',
+                        'Damage': 2 + number % 5}
+        cards.setdefault(setname, {}).setdefault(rarity, {})[f'Card {number}'] = carddata
+    return cards
+
+
+def measure(mode, path, lookups):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.run([sys.executable, '-c', CHILD, mode, path, str(lookups)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    seconds, rss, platform = output.split()
+    # ru_maxrss is in bytes on macOS, everything else is in KiB
+    rss = int(rss) * (1 if platform == 'darwin' else 1024)
+    return float(seconds), rss
+
+
+def run(count=10000, lookups=100):
+    cards = synthetic_catalog(count)
+    with tempfile.TemporaryDirectory() as tempdir:
+        sourcepath = os.path.join(tempdir, 'cards.py')
+        with open(sourcepath, 'w') as source:
+            source.write(f'CARDS = {cards!r}\n')
+        snappath = os.path.join(tempdir, 'cards.snapshot')
+        snapshot.build(cards, snappath)
+        base_time, base_rss = measure('baseline', sourcepath, lookups)
+        print(f"{count} cards, {lookups} lookups; snapshot file {os.path.getsize(snappath) / 2**20:.1f} MiB")
+        for mode, path in (('source', sourcepath), ('snapshot', snappath)):
+            seconds, rss = measure(mode, path, lookups)
+            print(f"  {mode:<8} load {(seconds - base_time) * 1000:8.1f} ms, "
+                  f"RSS +{(rss - base_rss) / 2**20:6.1f} MiB")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    run(*args)
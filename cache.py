@@ -0,0 +1,57 @@
+"""
+Small bounded caches for values derived from the card catalog.
+"""
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A least-recently-used cache with hit/miss counters.
+
+    If `version` is given it is called on every lookup; when the value it
+    returns changes (e.g. the card registry was reloaded) the cache drops
+    everything it holds.
+    """
+    def __init__(self, maxsize=512, version=None):
+        self.maxsize = maxsize
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._version = version() if version else None
+
+    def _check_version(self):
+        if self.version:
+            current = self.version()
+            if current != self._version:
+                self._data.clear()
+                self._version = current
+
+    def get(self, key, default=None):
+        self._check_version()
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._check_version()
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self._data)
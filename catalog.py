@@ -0,0 +1,148 @@
+"""
+Catalog queries and weighted card sampling.
+
+`index()` returns secondary indexes over the current registry (element,
+type, rarity, set and stat bonus), rebuilt the first time it is used after
+the catalog changes.  `AliasSampler` draws from a fixed weighted list in
+constant time per draw; `sampler()` caches samplers per catalog version.
+"""
+import random
+from cardsystem import registry
+from cardsystem.stats import STATS
+
+INDEXED_FIELDS = ('Element', 'Type', 'Rarity', 'Set')
+
+# Rarity odds of randomly filled decks.
+FILL_RARITY_WEIGHTS = {'Common': 9, 'Uncommon': 2, 'Rare': 1}
+
+
+class CardIndex(object):
+    """
+    Card strings grouped by field value and by the stats they raise.
+    Every group is a tuple in catalog order.
+    """
+    def __init__(self, cards):
+        fields = {field: {} for field in INDEXED_FIELDS}
+        bonuses = {stat: [] for stat in STATS}
+        for cardstring in cards:
+            carddata = cards.get(cardstring)
+            for field in INDEXED_FIELDS:
+                value = carddata.get(field)
+                if value is not None:
+                    fields[field].setdefault(value, []).append(cardstring)
+            for stat in STATS:
+                if carddata.get(stat):
+                    bonuses[stat].append(cardstring)
+        self.fields = {field: {value: tuple(group) for value, group in values.items()}
+                       for field, values in fields.items()}
+        self.bonuses = {stat: tuple(group) for stat, group in bonuses.items()}
+
+    def values(self, field):
+        """The distinct values of an indexed field."""
+        return tuple(self.fields[field])
+
+    def query(self, stat=None, **criteria):
+        """
+        Return the card strings matching every criterion, e.g.
+        query(Set='Base', Rarity='Common', Type='Attack', stat='Strength').
+        """
+        groups = [self.fields[field].get(value, ()) for field, value in criteria.items()]
+        if stat:
+            groups.append(self.bonuses.get(stat, ()))
+        if not groups:
+            return ()
+        groups.sort(key=len)
+        if len(groups) == 1:
+            return groups[0]
+        others = [set(group) for group in groups[1:]]
+        return tuple(cardstring for cardstring in groups[0] if all(cardstring in other for other in others))
+
+
+class AliasSampler(object):
+    """
+    Weighted sampling with Vose's alias method: O(n) to build, O(1) per
+    draw.
+    """
+    def __init__(self, items, weights):
+        items = list(items)
+        weights = [float(weight) for weight in weights]
+        total = sum(weights)
+        if not items or total <= 0:
+            raise ValueError("AliasSampler needs at least one item with a positive weight.")
+        count = len(items)
+        scaled = [weight * count / total for weight in weights]
+        self.items = items
+        self.weights = weights
+        self.prob = [0.0] * count
+        self.alias = [0] * count
+        small = [i for i, weight in enumerate(scaled) if weight < 1]
+        large = [i for i, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            if scaled[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, rng=random):
+        column = rng.randrange(len(self.items))
+        if rng.random() < self.prob[column]:
+            return self.items[column]
+        return self.items[self.alias[column]]
+
+    def samples(self, count, rng=random):
+        return [self.sample(rng) for i in range(0, count)]
+
+
+_INDEX = None
+_INDEX_VERSION = None
+_SAMPLERS = {}
+
+
+def index():
+    """Return the CardIndex of the current catalog version."""
+    global _INDEX, _INDEX_VERSION
+    if _INDEX_VERSION != registry.REGISTRY.version:
+        _INDEX = CardIndex(registry.REGISTRY)
+        _INDEX_VERSION = registry.REGISTRY.version
+        _SAMPLERS.clear()
+    return _INDEX
+
+
+def sampler(key, build):
+    """
+    Return the sampler cached under key for the current catalog version,
+    creating it with build() (which returns an AliasSampler) if needed.
+    """
+    index()
+    found = _SAMPLERS.get(key)
+    if found is None:
+        found = _SAMPLERS[key] = build()
+    return found
+
+
+def rarity_sampler(setname, rarity_weights):
+    """
+    Sampler over the cards of setname where each rarity is drawn with its
+    weight, split evenly between that rarity's cards.  Rarities the set has
+    no cards of are left out and the other weights scaled up to match;
+    ValueError is raised if that leaves nothing to draw.
+    """
+    def build():
+        items = []
+        weights = []
+        for rarity, weight in rarity_weights.items():
+            cards = index().query(Set=setname, Rarity=rarity)
+            if not cards or weight <= 0:
+                continue
+            items.extend(cards)
+            weights.extend([weight / len(cards)] * len(cards))
+        if not items:
+            raise ValueError(f"Set {setname} has no cards of rarity {', '.join(rarity_weights)}.")
+        return AliasSampler(items, weights)
+    return sampler(('rarity', setname, tuple(sorted(rarity_weights.items()))), build)
@@ -1,38 +1,276 @@
-import random
-from evennia import DefaultScript, create_script
+import gzip
+import heapq
+import json
+import os
+from collections import namedtuple
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from evennia import DefaultScript, create_script, search_script
 from evennia.commands.default.muxcommand import MuxCommand
 from evennia.utils.evmenu import EvMenu
-from cardsystem import helper
-from cardsystem.typeclasses import CardCharacter, NPC
-from typeclasses.characters import Character
+from evennia.utils.utils import delay
+from cardsystem import core, helper, registry
+from cardsystem.typeclasses import is_player, is_npc
+from cardsystem.party_handler import PARTIES
 from evennia.utils import logger
 
-class CombatHandler(DefaultScript):
+TURN_TIMEOUT = 60
+SCHEDULER_INTERVAL = 1
+SCHEDULER_KEY = "combat_scheduler"
+# Rounds of results kept in memory; older rounds go to the combat's log file.
+RESULT_HISTORY = 10
+COMBAT_LOG_DIR = os.path.join(settings.LOG_DIR, 'combat')
+# Seconds NPCs wait before acting when no player is in the fight, and the
+# number of turns in a row such a fight may last before it is called off.
+NPC_TURN_INTERVAL = 2
+MAX_NPC_TURNS = 30
+
+# Trace levels for CombatHandler.trace; a fight only formats trace output
+# at or below the highest level someone has subscribed to.
+TRACE_OFF = 0
+TRACE_INFO = 1
+TRACE_DEBUG = 2
+TRACE_LEVELS = {'off': TRACE_OFF, 'info': TRACE_INFO, 'debug': TRACE_DEBUG}
+
+# What a combatant's menu shows during one turn; built once by CombatHandler.menu_model.
+MenuModel = namedtuple('MenuModel', ['hand', 'cards', 'briefs', 'groups', 'options'])
+
+_SCHEDULER = None
+
+
+def combat_log_path(combat_id):
+    return os.path.join(COMBAT_LOG_DIR, f'combat_{combat_id}.log.gz')
+
+
+def read_combat_log(combat_id, start=1, end=None):
+    """Return {round: results} for logged rounds start..end (inclusive) of a combat."""
+    results = {}
+    path = combat_log_path(combat_id)
+    if not os.path.exists(path):
+        return results
+    with gzip.open(path, 'rt', encoding='utf-8') as logfile:
+        for line in logfile:
+            entry = json.loads(line)
+            if entry['round'] >= start and (end is None or entry['round'] <= end):
+                results[entry['round']] = entry['results']
+    return results
+
+
+def get_scheduler():
+    """Return the global combat scheduler, creating it if needed."""
+    global _SCHEDULER
+    if _SCHEDULER is None or not _SCHEDULER.id:
+        found = search_script(SCHEDULER_KEY)
+        if found:
+            _SCHEDULER = found[0]
+        else:
+            _SCHEDULER = create_script(CombatScheduler, key=SCHEDULER_KEY)
+    return _SCHEDULER
+
+
+class MessageBatch(object):
     """
-    This implements the combat handler.
+    Collects outgoing lines per recipient, dropping exact duplicates, so a
+    whole turn reaches each session as a single message.
+    """
+    def __init__(self):
+        self._lines = {}
+
+    def add(self, recipient, message):
+        recipient, lines = self._lines.setdefault(recipient.id, (recipient, []))
+        message = str(message)
+        if message not in lines:
+            lines.append(message)
+
+    def flush(self):
+        pending, self._lines = self._lines, {}
+        for recipient, lines in pending.values():
+            recipient.msg('\n'.join(lines))
+
+
+class CombatScheduler(DefaultScript):
+    """
+    Owns every active combat and resolves their turns.
+
+    Combats are plain CombatHandler objects kept in memory.  Their turn
+    deadlines live in a heap; each tick pops every deadline that has passed
+    and resolves those turns as a batch.  Combat state is only written to
+    the database on server reload/shutdown so it can be restored at start.
     """
 
     def at_script_creation(self):
         """Called when script is first created"""
-
-        self.key = "combat_handler_%i" % random.randint(1, 1000)
-        self.desc = "handles combat"
-        self.interval = 60
+        self.key = SCHEDULER_KEY
+        self.desc = "runs all combats"
+        self.interval = SCHEDULER_INTERVAL
         self.start_delay = True
         self.persistent = True
 
-        self.db.characters = {}
-        self.db.turn_actions = {}
-        self.db.action_count = {}
-        self.db.disconnected_turns = {}
-        self.db.combat_results = {0: ''}
-        self.db.last_round = 0
+        self.db.next_id = 1
+        self.db.saved_combats = []
+
+    def at_start(self):
+        """
+        Called on first start and after a server reboot; restores any
+        combats saved at reload/shutdown.
+        """
+        self.ndb.combats = {}
+        self.ndb.deadlines = []
+        self.ndb.sequence = 0
+        for state in self.db.saved_combats or []:
+            handler = CombatHandler.from_state(self, state)
+            self.ndb.combats[handler.id] = handler
+            handler.at_start()
+            self.schedule(handler)
+        self.db.saved_combats = []
+
+    def _save_combats(self):
+        self.db.saved_combats = [handler.get_state() for handler in self.ndb.combats.values()]
+
+    def at_server_reload(self):
+        self._save_combats()
+
+    def at_server_shutdown(self):
+        self._save_combats()
+
+    def at_repeat(self):
+        """Resolve every combat whose turn timer has run out."""
+        now = time.time()
+        deadlines = self.ndb.deadlines
+        due = []
+        while deadlines and deadlines[0][0] <= now:
+            deadline, _, combat_id = heapq.heappop(deadlines)
+            handler = self.ndb.combats.get(combat_id)
+            # entries are left behind when a turn ends early; skip stale ones
+            if handler and handler.deadline == deadline:
+                due.append(handler)
+        for handler in due:
+            # one broken fight must not keep the others from resolving
+            try:
+                handler.msg_all("Turn timer timed out. Continuing.")
+                handler.end_turn()
+            except Exception:
+                logger.log_trace(f"{handler.key}: turn failed to resolve.")
+
+    def create_combat(self):
+        """Start tracking a new combat and return its handler."""
+        combat_id = self.db.next_id
+        self.db.next_id = combat_id + 1
+        handler = CombatHandler(self, combat_id)
+        self.ndb.combats[combat_id] = handler
+        self.schedule(handler)
+        return handler
+
+    def schedule(self, handler):
+        """(Re)start the turn timer of handler."""
+        handler.deadline = time.time() + TURN_TIMEOUT
+        self.ndb.sequence += 1
+        heapq.heappush(self.ndb.deadlines, (handler.deadline, self.ndb.sequence, handler.id))
+
+    def remove_combat(self, handler):
+        handler.deadline = None
+        self.ndb.combats.pop(handler.id, None)
+
+
+class CombatHandler(object):
+    """
+    This implements the combat handler.
+
+    A combat handler is lightweight state for a single fight; turn timing
+    is done by the CombatScheduler that owns it.
+    """
+
+    def __init__(self, scheduler, combat_id):
+        self.scheduler = scheduler
+        self.id = combat_id
+        self.key = "combat_handler_%i" % combat_id
+        self.deadline = None
+        self.active = True
+
+        self.characters = {}
+        self.turn_actions = {}
+        self.action_count = {}
+        self.disconnected_turns = {}
+        # only the last RESULT_HISTORY rounds, see _store_results()
+        self.combat_results = {}
+        self.last_round = 0
+        # turns in a row without a player, see end_turn()
+        self.npc_turns = 0
+        # per-turn combat menu view models, see menu_model()
+        self.menu_models = {}
+        self.menu_version = None
+        # open MessageBatch while a turn or action is being processed
+        self.batch = None
+        # ids of NPCs with a decision queued, see schedule_npc_actions()
+        self.pending_npcs = set()
+        # faction index, kept up to date by _init_character/_cleanup_character
+        # and update_side: {side: {character id: character}}, {character id: side}
+        self.sides = {}
+        self.character_sides = {}
+        # {side: {'Friend': (...), 'Foe': (...)}}, rebuilt lazily after changes
+        self._groups = {}
+        # {subscriber id: (subscriber, level)}; not persisted
+        self.trace_subscribers = {}
+        self.trace_level = TRACE_OFF
+
+    def get_state(self):
+        """Return the persistable state of this combat."""
+        return {'id': self.id,
+                'characters': self.characters,
+                'turn_actions': self.turn_actions,
+                'action_count': self.action_count,
+                'disconnected_turns': self.disconnected_turns,
+                'combat_results': self.combat_results,
+                'last_round': self.last_round,
+                'npc_turns': self.npc_turns}
+
+    @classmethod
+    def from_state(cls, scheduler, state):
+        handler = cls(scheduler, state['id'])
+        handler.characters = dict(state['characters'])
+        handler.turn_actions = {key: [dict(action) for action in actions] for key, actions in state['turn_actions'].items()}
+        handler.action_count = dict(state['action_count'])
+        handler.disconnected_turns = dict(state['disconnected_turns'])
+        handler.combat_results = dict(state['combat_results'])
+        handler.last_round = state['last_round']
+        handler.npc_turns = state.get('npc_turns', 0)
+        return handler
 
     def _init_character(self, character):
         """
         This initializes handler back-reference
         """
         character.ndb.combat_handler = self
+        self._index_character(character)
+
+    @staticmethod
+    def side_of(character):
+        """Party members fight on their party's side; anyone else fights alone."""
+        party = PARTIES.party_of(character)
+        return ('party', party.id) if party else ('solo', character.id)
+
+    def _index_character(self, character):
+        side = self.side_of(character)
+        self.sides.setdefault(side, {})[character.id] = character
+        self.character_sides[character.id] = side
+        self._groups = {}
+
+    def _unindex_character(self, characterid):
+        side = self.character_sides.pop(characterid, None)
+        if side is not None:
+            members = self.sides[side]
+            members.pop(characterid, None)
+            if not members:
+                del self.sides[side]
+        self._groups = {}
+
+    def update_side(self, character):
+        """Move character to its current side after it joined or left a party."""
+        if character.id in self.characters and self.character_sides.get(character.id) != self.side_of(character):
+            self._unindex_character(character.id)
+            self._index_character(character)
+            self.menu_models = {}
 
     def _cleanup_character(self, character):
         """
@@ -40,51 +278,74 @@ class CombatHandler(DefaultScript):
         the back-reference
         """
         dbref = character.id
-        del self.db.characters[dbref]
-        del self.db.turn_actions[dbref]
-        del self.db.action_count[dbref]
-        del self.db.disconnected_turns[dbref]
+        self.menu_models = {}
+        del self.characters[dbref]
+        del self.turn_actions[dbref]
+        del self.action_count[dbref]
+        del self.disconnected_turns[dbref]
+        self._unindex_character(dbref)
         del character.ndb.combat_handler
+        character.flush_zones()
         try:
             character.cleareffects()
             if character.nattributes.get('_menutree'):
                 character.ndb._menutree.close_menu()
         except:
             pass
+        character.flush_effects()
 
     def at_start(self):
         """
-        This is called on first start but also when the script is restarted
-        after a server reboot. We need to re-assign this combat handler to
-        all characters as well as re-assign the cmdset.
+        This is called when the combat is restored after a server reboot.
+        We need to re-assign this combat handler to all characters.
         """
-        for character in self.db.characters.values():
+        for character in self.characters.values():
             self._init_character(character)
+        self.schedule_npc_actions()
+
+    def stop(self):
+        """End the combat and release all combatants."""
+        if not self.active:
+            return
+        self.active = False
+        self.scheduler.remove_combat(self)
+        self.at_stop()
 
     def at_stop(self):
-        """Called just before the script is stopped/destroyed."""
-        for character in list(self.db.characters.values()):
-            # note: the list() call above disconnects list from database
-            self.msg_all("Combat has ended")
+        """Called just before the combat is removed from the scheduler."""
+        self.msg_all("Combat has ended")
+        for character in list(self.characters.values()):
             self._cleanup_character(character)
+        # the handler is dropped after this, so the log must hold every round
+        try:
+            self._log_results(sorted(self.combat_results))
+        except OSError:
+            logger.log_trace(f"{self.key}: could not write the combat log.")
+        for subscriber, level in self.trace_subscribers.values():
+            subscriber.msg(f"TRACE {self.key}: combat ended.")
+        self.trace_subscribers = {}
+        self.trace_level = TRACE_OFF
+
+    def subscribe_trace(self, subscriber, level=TRACE_DEBUG):
+        """Send this fight's trace output at or below level to subscriber; TRACE_OFF unsubscribes."""
+        if level > TRACE_OFF:
+            self.trace_subscribers[subscriber.id] = (subscriber, level)
+        else:
+            self.trace_subscribers.pop(subscriber.id, None)
+        self.trace_level = max((level for _, level in self.trace_subscribers.values()), default=TRACE_OFF)
 
-    def at_repeat(self):
+    def trace(self, level, message, *args):
         """
-        This is called every self.interval seconds (turn timeout) or
-        when force_repeat is called (because everyone has entered their
-        commands). We know this by checking the existence of the
-        `normal_turn_end` NAttribute, set just before calling
-        force_repeat.
-
+        Send a trace message to subscribers of this fight.  message is only
+        formatted (with str.format(*args)) if someone listens at level.
         """
-        if self.ndb.normal_turn_end:
-            # we get here because the turn ended normally
-            # (force_repeat was called) - no msg output
-            del self.ndb.normal_turn_end
-        else:
-            # turn timeout
-            self.msg_all("Turn timer timed out. Continuing.")
-        self.end_turn()
+        if level > self.trace_level:
+            return
+        if args:
+            message = message.format(*args)
+        for subscriber, sublevel in self.trace_subscribers.values():
+            if level <= sublevel:
+                subscriber.msg(f"TRACE {self.key}: {message}")
 
     def target_opponent(self, character):
         pass
@@ -94,30 +355,59 @@ class CombatHandler(DefaultScript):
     def add_character(self, character):
         """Add combatant to handler"""
         dbref = character.id
-        self.db.characters[dbref] = character
-        self.db.action_count[dbref] = 0
-        self.db.disconnected_turns[dbref] = 0
-        self.db.turn_actions [dbref] = [{'card': None, 'character': character, 'target': [None]}]
+        self.characters[dbref] = character
+        self.action_count[dbref] = 0
+        self.disconnected_turns[dbref] = 0
+        self.turn_actions[dbref] = [{'card': None, 'character': character, 'target': [None]}]
+        self.menu_models = {}
         # set up back-reference
         self._init_character(character)
-        if character in CardCharacter.objects.all() or character in Character.objects.all():
+        if is_player(character):
             EvMenu(character, 'cardsystem.combat_handler', startnode='combat_menu', cmd_on_exit=None)
-        elif character in NPC.objects.all() and len(self.db.characters) > 1:
-            character.combat_action()
+        self.schedule_npc_actions()
 
     def remove_character(self, character):
         """Remove combatant from handler"""
-        if character.id in self.db.characters:
+        if character.id in self.characters:
             self._cleanup_character(character)
-        if len(self.db.characters):
+        if len(self.characters) < 2:
             # if no more characters in battle, kill this handler
             self.stop()
 
     def msg_all(self, message):
         """Send message to all combatants"""
-        for character in self.db.characters.values():
+        for character in self.characters.values():
+            self.msg(character, message)
+
+    def msg(self, character, message):
+        """Send message to one character, batched if a batch is open."""
+        if self.batch is not None:
+            self.batch.add(character, message)
+        else:
             character.msg(message)
 
+    @contextmanager
+    def batched(self):
+        """
+        Buffer everything sent through msg/msg_all until the outermost
+        batched() block ends, then send one deduplicated payload per
+        recipient.
+        """
+        if self.batch is not None:
+            yield self.batch
+            return
+        self.batch = MessageBatch()
+        try:
+            yield self.batch
+        finally:
+            batch, self.batch = self.batch, None
+            batch.flush()
+
+    def flush_messages(self):
+        """Send what the open batch holds so far; it stays open."""
+        if self.batch is not None:
+            self.batch.flush()
+
     def add_action(self, card, character, target):
         """
         Called by combat commands to register an action with the handler.
@@ -131,169 +421,230 @@ class CombatHandler(DefaultScript):
         a tuple (character, action, target).
         """
         dbref = character.id
-        count = self.db.action_count[dbref]
+        count = self.action_count[dbref]
         if 0 <= count < 1:  # only allow 1 action
-            self.db.turn_actions[dbref][count] = {'card': card, 'character': character, 'target': target}
+            self.turn_actions[dbref][count] = {'card': card, 'character': character, 'target': list(target)}
         else:
             # report if we already used too many actions
             return False
-        self.db.action_count[dbref] += 1
-        # Check to see if any NPCs have not acted
-        for char in self.db.characters.values():
-            if char in NPC.objects.all() and self.db.action_count[char.id] < 1:
-                self.msg_all(f'{char.key} going.')
-                char.combat_action()
+        self.action_count[dbref] += 1
+        # NPCs that have not acted yet decide outside of this command
+        self.schedule_npc_actions()
         return True
 
+    def schedule_npc_actions(self):
+        """
+        Queue a decision for every NPC that has not acted this turn.  They
+        run from the reactor right after the current command or turn
+        change returns, so players never wait on NPC thinking.  Without a
+        player in the fight they wait NPC_TURN_INTERVAL seconds instead, so
+        NPC-only fights do not resolve turn after turn back to back.
+        """
+        if len(self.characters) < 2:
+            return
+        wait = 0 if any(is_player(character) for character in self.characters.values()) else NPC_TURN_INTERVAL
+        for character in self.characters.values():
+            if (is_npc(character) and self.action_count[character.id] < 1
+                    and character.id not in self.pending_npcs):
+                self.pending_npcs.add(character.id)
+                delay(wait, self._npc_action, character.id)
+
+    def _npc_action(self, characterid):
+        """Let one NPC choose and submit its action, if it still needs to."""
+        self.pending_npcs.discard(characterid)
+        character = self.characters.get(characterid)
+        if not self.active or character is None or self.action_count[characterid] > 0:
+            return
+        try:
+            with self.batched():
+                self.msg_all(f'{character.key} going.')
+                character.combat_action()
+        except Exception:
+            logger.log_trace(f"{self.key}: {character.key} failed to act.")
+
     def check_end_turn(self):
         """
         Called by the command to eventually trigger
         the resolution of the turn. We check if everyone
-        has added all their actions; if so we call force the
-        script to repeat immediately (which will call
-        `self.at_repeat()` while resetting all timers).
+        has added all their actions; if so the turn is
+        resolved immediately instead of waiting for the
+        scheduler's turn timer.
         """
-        if all(count > 0 for count in self.db.action_count.values()):
-            self.ndb.normal_turn_end = True
-            self.force_repeat()
+        if self.active and all(count > 0 for count in self.action_count.values()):
+            self.end_turn()
 
     def end_turn(self):
         """
         This resolves all actions by calling the rules module.
         It then resets everything and starts the next turn. It
-        is called by at_repeat().
+        is called by check_end_turn() or by the scheduler when
+        the turn timer runs out.
         """
-        self.resolve_combat()
+        # the next deadline is set first, so a turn that fails still times out again
+        if self.active:
+            self.scheduler.schedule(self)
+        with self.batched():
+            self.resolve_combat()
 
-        if len(self.db.characters) < 2:
-            # less than 2 characters in battle, kill this handler
+            if len(self.characters) < 2:
+                # less than 2 characters in battle, kill this handler
 
-            self.stop()
-        else:
-            # reset counters before next turn
-            for character in self.db.characters.values():
-                self.db.characters[character.id] = character
-                self.db.action_count[character.id] = 0
-                self.db.turn_actions[character.id] = [{'card': None, 'character': character, 'target': [None]}]
-                character.countdowneffects()
-                if character in CardCharacter.objects.all() or character in Character.objects.all():
+                self.stop()
+            else:
+                self.menu_models = {}
+                # reset counters before next turn
+                players = []
+                for character in list(self.characters.values()):
+                    self.action_count[character.id] = 0
+                    self.turn_actions[character.id] = [{'card': None, 'character': character, 'target': [None]}]
+                    character.countdowneffects()
+                    if is_player(character):
+                        players.append(character)
+                self.npc_turns = 0 if players else self.npc_turns + 1
+                if self.npc_turns > MAX_NPC_TURNS:
+                    self.msg_all("The fight peters out.")
+                    self.stop()
+                    return
+                if players:
+                    self.msg_all("Next turn begins ...")
+                # the new menus must arrive after this turn's results
+                self.flush_messages()
+                for character in players:
                     try:
                         if character.nattributes.get('_menutree'):
                             character.ndb._menutree.close_menu()
                     except:
                         pass
-                    self.msg_all("Next turn begins ...")
                     if character.has_account:
                         EvMenu(character, 'cardsystem.combat_handler', startnode='combat_menu', cmd_on_exit=None)
                     else:
-                        self.db.disconnected_turns[character.id] += 1
-                        if self.db.disconnected_turns[character.id] > 3:
+                        self.disconnected_turns[character.id] += 1
+                        if self.disconnected_turns[character.id] > 3:
                             self.remove_character(character)
-            for character in self.db.characters.values():
-                if character in NPC.objects.all() and len(self.db.characters) > 1:
-                    self.msg_all(f'{character.key} going.')
-                    character.combat_action()
+                # NPCs decide now, while the players read the new menus
+                self.schedule_npc_actions()
+        # write back the zones and effects changed by this turn in one go
+        for character in self.characters.values():
+            character.flush_zones()
+            character.flush_effects()
 
     def resolve_combat(self):
         """
-        Process combat results.
+        Process combat results.  The rules live in cardsystem.core; this
+        builds the combatant states, resolves them and writes them back.
         """
+        characters = dict(self.characters)
+        states = {key: character.card_state() for key, character in characters.items()}
+        actions = {}
+        for key, turn_actions in self.turn_actions.items():
+            actions[key] = [{'card': action['card'], 'targets': [target.id for target in action['target'] if target]}
+                            for action in turn_actions]
+        states, events = core.resolve_turn(states, actions, debug=self.trace_level >= TRACE_DEBUG)
         combat_results = ''
-        effects = {}
-        attacks = {}
-        for key, character in self.db.characters.items():
-            charname = character.key
-            self.msg_all(f"{charname} - {self.db.turn_actions[key]}")
-            for action in self.db.turn_actions[key]:
-                if action['card']:
-                    carddata = helper.get_card_data(action['card'])
-                    # Calculate Damage and Block/Dodge
-                    target = action['target']
-                    for t in list(target):
-                        if not t:
-                            target.remove(t)
-                    if target:
-                        targets = helper.pretty_list_objects(target)
-                        pool, cardindex = helper.find_card(character, action['card'], pools=['card_hand'])
-                        if pool:
-                            character.play(cardindex)
-                            if carddata['Type'] in ['Defend', 'Buff', 'Debuff', 'Weapon', 'Armor', 'Item']:
-                                if character not in effects.keys():
-                                    effects[character] = []
-                                combat_results += f'{charname} played {carddata["Name"]} targeting {targets}.\n'
-                                if carddata['Type'] == 'Defend':
-                                    stat = carddata.get('TargetStat', 'Health')
-                                    usestat = carddata.get('UseStat', 'Strength')
-                                    defendmult = character.get_stat(usestat)[0] / 10
-                                    self.msg_all(f'Defend: {stat}, {usestat}, {defendmult}, {carddata["Defense"]}')
-                                    effect = {'Defend': stat, 'Amount': int(carddata['Defense'] * defendmult), 'Element': carddata['Element']}
-                                    effects[character].append(effect)
-                                if carddata['Type'] in ['Buff', 'Debuff']:
-                                    stat = carddata.get('TargetStat', 'Strength')
-                                    usestat = carddata.get('UseStat', 'Intelligence')
-                                    buffmult = character.get_stat(usestat)[0] / 10
-                                    amount = int(carddata.get('Amount', 1) * buffmult)
-                                    duration = carddata.get('Duration', -1)
-                                    if carddata['Type'] == 'Debuff':
-                                        amount = 0 - amount
-                                    for tgt in target:
-                                        tgt.addeffect(stat, amount, duration=duration, source=character)
-                            elif carddata['Type'] in ['Attack']:
-                                if character in attacks.keys():
-                                    attacks[character].append(action)
-                                else:
-                                    attacks[character] = [action]
-                else:
-                    combat_results += f'{charname} played nothing.\n'
-        self.msg_all(f'Before Attack: {effects}')
-        for character, actionlist in attacks.items():
-            for action in actionlist:
-                carddata = helper.get_card_data(action['card'])
-                cardname = helper.card_brief(carddata)
-                for tgt in action['target']:
-                    basedamage = carddata["Damage"]
-                    usestat = carddata.get('UseStat', 'Strength')
-                    statmult = character.get_stat(usestat)[0] / 10
-                    damage = int(basedamage * statmult)
-                    if carddata.get('Requires', None):
-                        itemfound = False
-                        for itemcard in character.db.card_played:
-                            itemcarddata = helper.get_card_data(itemcard)
-                            if itemcarddata['Type'] == carddata.get('Requires'):
-                                itemfound = True
-                                itemmult = itemcarddata.get('AttackMultiplier', 1)
-                                continue
-                        if itemfound:
-                            damage = int(damage * itemmult)
-                        else:
-                            combat_results += (f'{character.key} played an unplayable card.')
-                            continue
-                    self.msg_all(f'Base: {basedamage}, Stat: {usestat}, Mult: {statmult}, Damage: {damage}')
-                    tgteffects = effects.get(tgt, [])
-                    for effect in tgteffects:
-                        if 'Defend' in effect.keys() and carddata.get('TargetStat', 'Health') == effect['Defend']:
-                            damage -= effect['Amount']
-                    # TODO: Calculate actual damage with buffs, debuffs, etc.
-                    damage -= tgt.defense
-                    damage = 0-max(0, damage)
-                    self.msg_all('Stuff 1')
-                    tgt.modify_stat('Health', damage)
-                    self.msg_all('Stuff 2')
-                    combat_results += (f'{character.key} attacks {tgt.key} with {cardname} for {abs(damage)} damage.\n')
-        self.db.last_round += 1
-        self.db.combat_results[self.db.last_round] = combat_results
+        for event in events:
+            if event['event'] == 'debug':
+                self.trace(TRACE_DEBUG, event['text'])
+            elif event['event'] != 'msg':
+                combat_results += self._describe(event, characters)
+        for key, character in characters.items():
+            character.apply_card_state(states[key], events, check=False)
+        self.last_round += 1
+        self._store_results(self.last_round, combat_results)
+        self.trace(TRACE_INFO, "Round {} resolved:\n{}", self.last_round, combat_results)
+        for character in characters.values():
+            character.check_stats()
+
+    def _store_results(self, roundnum, results):
+        """
+        Keep results in memory and move rounds older than RESULT_HISTORY
+        to this combat's compressed log file.
+        """
+        self.combat_results[roundnum] = results
+        self._log_results(sorted(self.combat_results)[:-RESULT_HISTORY])
+
+    def _log_results(self, rounds):
+        """Move the given rounds from memory to this combat's log file."""
+        if not rounds:
+            return
+        os.makedirs(COMBAT_LOG_DIR, exist_ok=True)
+        # every append adds a gzip member; gzip reads them back as one stream
+        with gzip.open(combat_log_path(self.id), 'at', encoding='utf-8') as logfile:
+            for roundnum in rounds:
+                logfile.write(json.dumps({'round': roundnum, 'results': self.combat_results.pop(roundnum)}) + '\n')
+
+    def get_results(self, start=1, end=None):
+        """Return {round: results} for rounds start..end, from memory and the log file."""
+        end = self.last_round if end is None else end
+        results = {}
+        if self.combat_results and start < min(self.combat_results):
+            results.update(read_combat_log(self.id, start, end))
+        for roundnum, text in self.combat_results.items():
+            if start <= roundnum <= end:
+                results[roundnum] = text
+        return results
+
+    def _describe(self, event, characters):
+        """Format a core event as a line of combat results."""
+        actor = characters[event['actor']].key
+        if event['event'] == 'nothing':
+            return f'{actor} played nothing.\n'
+        carddata = helper.get_card_data(event['card'])
+        if event['event'] == 'played':
+            targets = helper.pretty_list([characters[target].key for target in event['targets']])
+            return f'{actor} played {carddata["Name"]} targeting {targets}.\n'
+        if event['event'] == 'unplayable':
+            return f'{actor} played an unplayable card.\n'
+        if event['event'] == 'attack':
+            return f'{actor} attacks {characters[event["target"]].key} with {helper.card_brief(carddata)} for {event["damage"]} damage.\n'
+        return ''
+
+    def menu_model(self, character):
+        """
+        Return the combat menu view model of character for this turn,
+        building it (and drawing up to hand size) on first use.  Every menu
+        node visited during the turn reuses it.
+        """
+        if self.menu_version != registry.REGISTRY.version:
+            # the card catalog was reloaded; rebuild every menu from the new data
+            self.menu_models = {}
+            self.menu_version = registry.REGISTRY.version
+        model = self.menu_models.get(character.id)
+        if model is None:
+            character.draw(character.db.hand_size - len(character.hand))
+            character.flush_zones()
+            hand = tuple(character.hand)
+            cards = {card: helper.get_card_data(card) for card in hand}
+            briefs = {card: helper.card_brief(carddata) for card, carddata in cards.items()}
+            groups = self.get_groups(character)
+            options = []
+            for card in hand:
+                options.append({'desc': f'Play {briefs[card]}', 'goto': ('checktargets', {'card': card})})
+            for index, card in enumerate(hand):
+                options.append({'key': f'x{index+1}', 'desc': f'Examine {briefs[card]}', 'goto': ('combat_menu', {'details': card})})
+            options.append({'key': 'hand', 'desc': 'View your hand', 'goto': ('combat_menu', {'hand': True})})
+            options.append({'key': 'stats', 'desc': 'View combat stats', 'goto': ('combat_menu', {'stats': True})})
+            options.append({'key': 'flee', 'desc': 'Run from combat', 'goto': 'fleecombat'})
+            model = MenuModel(hand, cards, briefs, groups, tuple(options))
+            self.menu_models[character.id] = model
+        return model
 
     def get_groups(self, obj):
-        phandler = obj.ndb.party_handler
-        group = {'Friend': [], 'Foe': []}
-        for characterid in self.db.characters.keys():
-            if characterid == obj.id:
-                group['Friend'].append(self.db.characters[characterid])
-            elif phandler and characterid in phandler.db.characters.keys():
-                group['Friend'].append(self.db.characters[characterid])
-            else:
-                group['Foe'].append(self.db.characters[characterid])
-        return group
+        """
+        Return {'Friend': (...), 'Foe': (...)} for obj's side.  The tuples
+        are shared by everyone on that side until the membership changes.
+        """
+        side = self.character_sides[obj.id]
+        groups = self._groups.get(side)
+        if groups is None:
+            friends = self.sides[side]
+            groups = {'Friend': tuple(friends.values()),
+                      'Foe': tuple(character for characterid, character in self.characters.items()
+                                   if characterid not in friends)}
+            self._groups[side] = groups
+        return groups
+
+    def is_friend(self, obj, other):
+        return self.character_sides.get(obj.id) == self.character_sides.get(other.id)
 
 class CmdAttack(MuxCommand):
     """
@@ -318,7 +669,7 @@ class CmdAttack(MuxCommand):
         target = caller.search(self.args)
         if not target:
             return
-        if target.ndb.party_handler and player.ndb.party_handler == target.ndb.party_handler:
+        if PARTIES.same_party(caller, target):
             self.caller.msg("You cannot attack someone in your party!")
             return
         # set up combat
@@ -328,48 +679,131 @@ class CmdAttack(MuxCommand):
             target.ndb.combat_handler.msg_all("%s joins combat!" % self.caller)
         else:
             # create a new combat handler
-            chandler = create_script("cardsystem.combat_handler.CombatHandler")
+            chandler = get_scheduler().create_combat()
             self.caller.msg("You attack %s! You are in combat." % target)
             target.msg("%s attacks you! You are in combat." % self.caller)
             chandler.add_character(self.caller)
             chandler.add_character(target)
-            for member in chandler.db.characters.values():
-                if member.ndb.party_handler:
-                    party_handler = self.caller.ndb.party_handler
+            for member in list(chandler.characters.values()):
+                party_handler = PARTIES.party_of(member)
+                if party_handler:
                     for character in party_handler.db.characters.values():
-                        if character != member and character.id not in chandler.db.characters.keys():
+                        if character != member and character.id not in chandler.characters.keys():
                             chandler.add_character(character)
                             chandler.msg_all("%s joins combat!" % character)
 
 
+class CmdCombatTrace(MuxCommand):
+    """
+    follow the trace of a fight
+
+    Usage:
+      combattrace <combatant>[ = info||debug||off]
+
+    Subscribes you to the trace output of the fight <combatant> is
+    in, at the given level (default debug). Use 'off' to stop.
+    """
+    key = "combattrace"
+    locks = "cmd:perm(Admin)"
+    help_category = "Admin"
+
+    def func(self):
+        """Handle command"""
+        caller = self.caller
+        if not self.lhs:
+            caller.msg("Usage: combattrace <combatant>[ = info||debug||off]")
+            return
+        level = TRACE_LEVELS.get((self.rhs or 'debug').strip().lower())
+        if level is None:
+            caller.msg(f"Trace level must be one of: {', '.join(TRACE_LEVELS)}.")
+            return
+        target = caller.search(self.lhs, global_search=True)
+        if not target:
+            return
+        chandler = target.ndb.combat_handler
+        if not chandler:
+            caller.msg(f"{target.key} is not in combat.")
+            return
+        chandler.subscribe_trace(caller, level)
+        if level == TRACE_OFF:
+            caller.msg(f"You stop tracing {chandler.key}.")
+        else:
+            caller.msg(f"You are tracing {chandler.key} at level {self.rhs or 'debug'}.")
+
+
+class CmdCombatLog(MuxCommand):
+    """
+    review combat results
+
+    Usage:
+      combatlog [<round>[-<round>]]
+      combatlog [<round>[-<round>]] = <combat id>
+
+    Shows the results of the given rounds (default: the last 5) of
+    the fight you are in. Admins can read any combat's log by id.
+    """
+    key = "combatlog"
+    help_category = "General"
+
+    def func(self):
+        """Handle command"""
+        caller = self.caller
+        chandler = caller.ndb.combat_handler
+        if self.rhs:
+            if not caller.check_permstring("Admin"):
+                caller.msg("You can only review the fight you are in.")
+                return
+            if not self.rhs.strip().isnumeric():
+                caller.msg("Usage: combatlog [<round>[-<round>]] = <combat id>")
+                return
+            combat_id = int(self.rhs)
+            scheduler = get_scheduler()
+            chandler = scheduler.ndb.combats.get(combat_id) if scheduler.ndb.combats else None
+        elif not chandler:
+            caller.msg("You are not in combat.")
+            return
+        else:
+            combat_id = chandler.id
+        start, end = None, None
+        if self.lhs:
+            bounds = self.lhs.replace(' ', '').split('-')
+            if not all(bound.isnumeric() for bound in bounds) or len(bounds) > 2:
+                caller.msg("Usage: combatlog [<round>[-<round>]]")
+                return
+            start = int(bounds[0])
+            end = int(bounds[-1])
+        if chandler:
+            if start is None:
+                start = max(1, chandler.last_round - 4)
+            results = chandler.get_results(start, end)
+        else:
+            results = read_combat_log(combat_id, start or 1, end)
+        if not results:
+            caller.msg("No combat results found.")
+            return
+        text = ''
+        for roundnum in sorted(results):
+            text += f'|hRound {roundnum}:|n\n{results[roundnum]}'
+        caller.msg(text)
+
+
 def combat_menu(caller, raw_string, **kwargs):
 
     chandler = caller.ndb.combat_handler
-    group = chandler.get_groups(caller)
-    caller.draw(caller.db.hand_size - len(caller.db.card_hand))
+    model = chandler.menu_model(caller)
     text = ""
     if 'hand' in kwargs.keys():
-        text += str(helper.card_small_multiple(caller.db.card_hand, title="Your Hand"))
+        text += str(helper.card_small_multiple(model.hand, title="Your Hand"))
     elif 'details' in kwargs.keys():
         carddata = helper.get_card_data(kwargs['details'])
         text += str(helper.card_detail(carddata))
     elif 'stats' in kwargs.keys():
-        combat_stats = helper.combat_stats_multiple(list(group['Friend']) + list(group['Foe']))
+        combat_stats = helper.combat_stats_multiple(list(model.groups['Friend']) + list(model.groups['Foe']))
         text += str(combat_stats)
     else:
-        if chandler.db.last_round:
-            text += f'Last Round Results:\n{chandler.db.combat_results[chandler.db.last_round]}\n'
-    options = []
-    for card in caller.db.card_hand:
-        cardname = helper.card_brief(helper.get_card_data(card))
-        options.append({'desc': f'Play {cardname}', 'goto': ('checktargets', {'card': card})})
-    for index in range(0, len(caller.db.card_hand)):
-        carddata = helper.get_card_data(caller.db.card_hand[index])
-        options.append({'key': f'x{index+1}', 'desc': f'Examine {helper.card_brief(carddata)}', 'goto': ('combat_menu', {'details': carddata['CardString']})})
-    options.append({'key': 'hand', 'desc': 'View your hand', 'goto': ('combat_menu', {'hand': True})})
-    options.append({'key': 'stats', 'desc': 'View combat stats', 'goto': ('combat_menu', {'stats': True})})
-    options.append({'key': 'flee', 'desc': 'Run from combat', 'goto': 'fleecombat'})
-    return text, options
+        if chandler.last_round:
+            text += f'Last Round Results:\n{chandler.combat_results[chandler.last_round]}\n'
+    return text, list(model.options)
 
 def checktargets(caller, raw_string, **kwargs):
     text = ''
@@ -378,10 +812,11 @@ def checktargets(caller, raw_string, **kwargs):
     chandler = caller.ndb.combat_handler
     phandler = caller.ndb.party_handler
     if card:
-        card_details = helper.get_card_data(card)
-        cardname = helper.card_brief(card_details)
-        group = chandler.get_groups(caller)
-        chandler.msg_all(group)
+        model = chandler.menu_model(caller)
+        card_details = model.cards.get(card) or helper.get_card_data(card)
+        cardname = model.briefs.get(card) or helper.card_brief(card_details)
+        group = model.groups
+        chandler.trace(TRACE_DEBUG, "{} targeting groups: {}", caller.key, group)
         target = None
         if card_details['Type'] == 'Attack' or card_details['Type'] == 'Debuff':
             if len(group['Foe']) == 1:
@@ -412,7 +847,7 @@ def checktargets(caller, raw_string, **kwargs):
             chandler.add_action(card, caller, target)
         if target:
             targetname = helper.pretty_list(target)
-            if target == [caller]:
+            if list(target) == [caller]:
                 targetname = 'yourself'
             caller.msg(f'You play {cardname} targeting {targetname}.')
             chandler.check_end_turn()
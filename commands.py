@@ -1,41 +1,89 @@
 import cardsystem
-from cardsystem import helper
-from cardsystem.combat_handler import CmdAttack
+from cardsystem import helper, registry
+from cardsystem.zones import INTERNER
+from cardsystem.combat_handler import CmdAttack, CmdCombatLog, CmdCombatTrace
 from cardsystem.party_handler import CmdPartyCreate
 from evennia import Command
 from evennia import default_cmds, settings
 from evennia.utils.evmenu import EvMenu
 
 
-class ShowDeck(Command):
-    key = 'showdeck'
+class ShowPile(Command):
+    """
+    Base for commands showing one of the caller's card zones.
+
+    Usage:
+      <command> [<filter>] [<page>||all]
+
+    Identical cards are grouped.  <filter> matches a card's name,
+    type or element.  Large piles are split into pages; use a page
+    number to show that page or 'all' to show every page.
+    """
+    zone = 'card_deck'
+    title = 'Your Deck'
 
     def func(self):
-        decklist = helper.card_small_multiple(self.caller.db.card_deck, title="Your Deck", width=self.client_width())
-        self.caller.msg(decklist)
+        args = self.args.split()
+        page = 1
+        if args and args[-1].isnumeric():
+            page = int(args.pop())
+        elif args and args[-1].lower() == 'all':
+            args.pop()
+            page = None
+        cardfilter = ' '.join(args) or None
+        cards = self.caller.zones.cards(self.zone)
+        for pagenum, pagecount, table in helper.card_small_pages(cards, title=self.title, width=self.client_width(),
+                                                                 filter=cardfilter, page=page):
+            self.caller.msg(table)
+            if page and pagecount > 1:
+                nextpage = ' '.join(args + [str(pagenum % pagecount + 1)])
+                self.caller.msg(f"Page {pagenum} of {pagecount}.  Use '{self.key} {nextpage}' for the next page.")
 
 
-class ShowHand(Command):
+class ShowDeck(ShowPile):
+    """
+    Show the cards in your deck.
+
+    Usage:
+      showdeck [<filter>] [<page>||all]
+    """
+    key = 'showdeck'
+    zone = 'card_deck'
+    title = 'Your Deck'
+
+
+class ShowHand(ShowPile):
+    """
+    Show the cards in your hand.
+
+    Usage:
+      showhand [<filter>] [<page>||all]
+    """
     key = 'showhand'
-    def func(self):
-        handlist = helper.card_small_multiple(self.caller.db.card_hand, title="Your Hand", width=self.client_width())
-        self.caller.msg(handlist)
+    zone = 'card_hand'
+    title = 'Your Hand'
 
 
-class ShowDiscard(Command):
+class ShowDiscard(ShowPile):
+    """
+    Show your discard pile.
+
+    Usage:
+      showdiscard [<filter>] [<page>||all]
+    """
     key = 'showdiscard'
-    def func(self):
-        discardlist = helper.card_small_multiple(self.caller.db.card_discard, title="Your Discard Pile", width=self.client_width())
-        self.caller.msg(discardlist)
+    zone = 'card_discard'
+    title = 'Your Discard Pile'
 
 
 class ShowCard(Command):
     key = 'showcard'
     def func(self):
         args = self.args.split(' ')
+        hand = self.caller.hand
         for arg in args:
-            if arg and arg.isnumeric() and int(arg) > 0 and int(arg) <= len(self.caller.db.card_hand):
-                card = helper.get_card_data(self.caller.db.card_hand[int(arg)-1])
+            if arg and arg.isnumeric() and int(arg) > 0 and int(arg) <= len(hand):
+                card = helper.get_card_data(hand[int(arg)-1])
                 # self.caller.msg(('<h2>Card Detail</h2>',{'type': 'evcard'}), options=None)
                 # self.caller.msg((helper.card_detail(card=card), {type: 'evcard'}), options=None)
                 self.caller.msg(helper.card_detail(card=card))
@@ -46,6 +94,33 @@ class CombatStats(Command):
         self.caller.msg(helper.combat_stats(self.caller))
 
 
+class CmdCardReload(default_cmds.MuxCommand):
+    """
+    Reload the card catalog
+
+    Usage:
+      cardreload[/force]
+
+    Re-reads cards.py, or cards.snapshot if it has been rebuilt, and
+    swaps the new card definitions in without a server reload.  Cached
+    renders, stat bonuses, NPC evaluations and combat menus are rebuilt
+    as they are next used.  Every card that has ever been in a deck must
+    still exist; use /force to reload anyway.
+    """
+    key = 'cardreload'
+    locks = "cmd:perm(Admin)"
+    help_category = "Admin"
+
+    def func(self):
+        required = () if 'force' in self.switches else INTERNER.strings()
+        try:
+            registry.REGISTRY.reload(refresh=True, required=required)
+        except (ValueError, KeyError, SyntaxError) as err:
+            self.caller.msg(f"Card catalog not reloaded: {err}")
+            return
+        self.caller.msg(f"Card catalog reloaded: {len(registry.REGISTRY)} cards, version {registry.REGISTRY.version}.")
+
+
 class CardCmdSet(default_cmds.CharacterCmdSet):
     key = "CardCharacter"
     def at_cmdset_creation(self):
@@ -55,6 +130,9 @@ class CardCmdSet(default_cmds.CharacterCmdSet):
         self.add(ShowCard)
         self.add(CombatStats)
         self.add(CmdAttack)
+        self.add(CmdCombatLog)
+        self.add(CmdCombatTrace)
+        self.add(CmdCardReload)
         self.add(CmdPartyCreate)
 
 
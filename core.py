@@ -0,0 +1,259 @@
+"""
+Headless combat rules.
+
+Everything in here works on plain `CombatantState` objects and has no
+Django or Evennia dependencies, so it can be used for AI lookahead,
+balance simulations and tests without a database.  `CardUserMixin` and
+`CombatHandler` are adapters that build states from their objects, call
+these functions and write the results back.
+
+Rules functions change the state they are given in place (`resolve_turn`
+works on copies instead) and return a list of events.  An event is a dict
+with an 'event' key naming what happened:
+
+    msg         - 'actor', 'text': a private message for one combatant
+    debug       - 'text': diagnostic output, only produced when asked for
+    played      - 'actor', 'card', 'targets'
+    nothing     - 'actor': no card was played
+    unplayable  - 'actor', 'card': a card's requirement was not met
+    attack      - 'actor', 'target', 'card', 'damage'
+"""
+import random
+from cardsystem import registry, stats
+from cardsystem.zones import OWNED_ZONES
+
+# Card types that are discarded after use instead of staying in play.
+ACTION_TYPES = ('Attack', 'Defend', 'Buff', 'Debuff')
+# Card types that are announced and may leave effects when played in combat.
+EFFECT_TYPES = ('Defend', 'Buff', 'Debuff', 'Weapon', 'Armor', 'Item')
+
+
+class CombatantState(object):
+    """
+    Plain snapshot of one combatant.
+
+     key - unique identifier (the object's id for database objects)
+     name - display name
+     stats - {stat: {'Max', 'Cur', 'Mod'}}
+     zones - a CardZones instance
+     effects - an EffectStore
+    """
+    def __init__(self, key, name, stats, zones, effects):
+        self.key = key
+        self.name = name
+        self.stats = stats
+        self.zones = zones
+        self.effects = effects
+
+    def copy(self):
+        return CombatantState(self.key, self.name, stats.copy_stats(self.stats), self.zones.copy(),
+                              self.effects.copy())
+
+
+def card(cardstring):
+    return registry.REGISTRY.get(cardstring)
+
+
+def get_stat(state, stat):
+    values = state.stats[stat]
+    return values['Cur'] + values['Mod'], values['Max']
+
+
+def defense_value(statblock, zones):
+    """Defense from a stat dict and the played cards of zones, without a full state."""
+    defense = int(statblock['Strength']['Cur'])
+    for cardstring in zones.cards('card_played'):
+        carddata = card(cardstring)
+        if carddata.get("DefenseMult"):
+            defense = defense * carddata['DefenseMult']
+    return int(defense/10)
+
+
+def defense(state):
+    return defense_value(state.stats, state.zones)
+
+
+def modify_stat(state, stat, amount):
+    if stat in state.stats:
+        mystat = state.stats[stat]
+        mystat['Cur'] = min(mystat['Max'], mystat['Cur'] + amount)
+    return []
+
+
+def shuffle(state, withdiscard=True, rng=random):
+    if withdiscard:
+        state.zones.move_all('card_discard', 'card_deck')
+    state.zones.shuffle('card_deck', rng=rng)
+    return []
+
+
+def draw(state, cardcount, rng=random):
+    events = []
+    zones = state.zones
+    for i in range(0, cardcount):
+        if zones.count('card_deck') == 0:
+            events.append({'event': 'msg', 'actor': state.key, 'text': 'Shuffling discard back into deck.'})
+            shuffle(state, rng=rng)
+        zones.move('card_deck', 0, 'card_hand')
+    return events
+
+
+def discard(state, index):
+    state.zones.move('card_hand', index, 'card_discard')
+    return []
+
+
+def play(state, index, fromzone='card_hand', rng=random):
+    """
+    Play the card at index of fromzone.  Action cards go to the discard
+    pile; anything else replaces a played card of the same type.
+    """
+    events = []
+    zones = state.zones
+    carddata = card(zones.get(fromzone, index))
+    cards_in = []
+    if carddata['Type'] in ACTION_TYPES:
+        zones.move(fromzone, index, 'card_discard')
+    else:
+        cardstring = zones.pop(fromzone, index)
+        played = zones.cards('card_played')
+        for played_index in reversed(range(0, len(played))):
+            played_carddata = card(played[played_index])
+            if played_carddata['Type'] == carddata['Type']:
+                events.append({'event': 'msg', 'actor': state.key, 'text': f"Removing {played_carddata['Name']} from play."})
+                events.extend(leaveplay(state, played_index))
+        events.append({'event': 'msg', 'actor': state.key, 'text': f'Playing {carddata["Name"]}'})
+        zones.append('card_played', cardstring)
+        if fromzone not in OWNED_ZONES:
+            cards_in.append(cardstring)
+    if carddata.get('Create', None):
+        zones.extend('card_deck', carddata['Create'])
+        zones.shuffle('card_deck', rng=rng)
+        cards_in.extend(carddata['Create'])
+    stats.add_cards(state.stats, cards_in)
+    return events
+
+
+def leaveplay(state, index):
+    zones = state.zones
+    carddata = card(zones.get('card_played', index))
+    cards_out = []
+    if carddata.get('Create', None):
+        for cardstring in carddata['Create']:
+            if zones.remove(cardstring):
+                cards_out.append(cardstring)
+    zones.move('card_played', index, 'card_discard')
+    stats.remove_cards(state.stats, cards_out)
+    return []
+
+
+def add_effect(state, stat, amount, duration=-1, source=None):
+    effectid, effect = state.effects.add(stat, amount, duration=duration, source=source)
+    stats.add_effects(state.stats, [effect])
+    return []
+
+
+def countdown_effects(state):
+    stats.remove_effects(state.stats, state.effects.advance())
+    return []
+
+
+def clear_effects(state):
+    stats.remove_effects(state.stats, state.effects.clear())
+    return []
+
+
+def prepare(state, rng=random):
+    """
+    Ready a freshly created combatant: put every equipped card into play,
+    rebuild the stats from the cards it owns and shuffle the deck.
+    """
+    events = []
+    for i in range(0, state.zones.count('card_equipped')):
+        events.extend(play(state, 0, fromzone='card_equipped', rng=rng))
+    state.stats = stats.recompute(state.stats, state.zones.all_cards(), state.effects.values())
+    events.extend(shuffle(state, rng=rng))
+    return events
+
+
+def resolve_turn(states, actions, rng=random, debug=False):
+    """
+    Resolve one combat turn.
+
+     states - {key: CombatantState}
+     actions - {key: [{'card': cardstring or None, 'targets': [key, ...]}]}
+     debug - include 'debug' events; they are not even formatted otherwise
+
+    Returns (new_states, events); the passed states are not modified.
+    """
+    states = {key: state.copy() for key, state in states.items()}
+    events = []
+    defends = {}
+    attacks = []
+    for key, state in states.items():
+        if debug:
+            events.append({'event': 'debug', 'text': f"{state.name} - {actions.get(key)}"})
+        for action in actions.get(key, []):
+            cardstring = action['card']
+            if not cardstring:
+                events.append({'event': 'nothing', 'actor': key})
+                continue
+            carddata = card(cardstring)
+            targets = [target for target in action['targets'] if target in states]
+            if not targets:
+                continue
+            pool, cardindex = state.zones.find(cardstring, ['card_hand'])
+            if not pool:
+                continue
+            events.extend(play(state, cardindex, rng=rng))
+            if carddata['Type'] in EFFECT_TYPES:
+                events.append({'event': 'played', 'actor': key, 'card': cardstring, 'targets': targets})
+                if carddata['Type'] == 'Defend':
+                    stat = carddata.get('TargetStat', 'Health')
+                    usestat = carddata.get('UseStat', 'Strength')
+                    defendmult = get_stat(state, usestat)[0] / 10
+                    if debug:
+                        events.append({'event': 'debug', 'text': f'Defend: {stat}, {usestat}, {defendmult}, {carddata["Defense"]}'})
+                    defends.setdefault(key, []).append({'Defend': stat, 'Amount': int(carddata['Defense'] * defendmult), 'Element': carddata['Element']})
+                if carddata['Type'] in ['Buff', 'Debuff']:
+                    stat = carddata.get('TargetStat', 'Strength')
+                    usestat = carddata.get('UseStat', 'Intelligence')
+                    buffmult = get_stat(state, usestat)[0] / 10
+                    amount = int(carddata.get('Amount', 1) * buffmult)
+                    duration = carddata.get('Duration', -1)
+                    if carddata['Type'] == 'Debuff':
+                        amount = 0 - amount
+                    for target in targets:
+                        add_effect(states[target], stat, amount, duration=duration, source=key)
+            elif carddata['Type'] == 'Attack':
+                attacks.append((key, cardstring, targets))
+    if debug:
+        events.append({'event': 'debug', 'text': f'Before Attack: {defends}'})
+    for key, cardstring, targets in attacks:
+        state = states[key]
+        carddata = card(cardstring)
+        for target in targets:
+            basedamage = carddata["Damage"]
+            usestat = carddata.get('UseStat', 'Strength')
+            statmult = get_stat(state, usestat)[0] / 10
+            damage = int(basedamage * statmult)
+            if carddata.get('Requires', None):
+                itemmult = None
+                for itemcard in state.zones.cards('card_played'):
+                    itemcarddata = card(itemcard)
+                    if itemcarddata['Type'] == carddata['Requires']:
+                        itemmult = itemcarddata.get('AttackMultiplier', 1)
+                if itemmult is None:
+                    events.append({'event': 'unplayable', 'actor': key, 'card': cardstring})
+                    continue
+                damage = int(damage * itemmult)
+            if debug:
+                events.append({'event': 'debug', 'text': f'Base: {basedamage}, Stat: {usestat}, Mult: {statmult}, Damage: {damage}'})
+            for effect in defends.get(target, []):
+                if carddata.get('TargetStat', 'Health') == effect['Defend']:
+                    damage -= effect['Amount']
+            damage -= defense(states[target])
+            damage = max(0, damage)
+            modify_stat(states[target], 'Health', 0 - damage)
+            events.append({'event': 'attack', 'actor': key, 'target': target, 'card': cardstring, 'damage': damage})
+    return states, events
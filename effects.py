@@ -0,0 +1,124 @@
+"""
+Active stat effects.
+
+Effects get monotonically increasing ids that are never reused, and timed
+effects are indexed by the absolute turn they expire on, so advancing a
+turn only touches the effects that actually run out.  Like the zones this
+is plain Python; `to_dict` gives the form stored in `db.card_effects`, and
+`dirty` tells the owner whether that needs writing.
+"""
+import heapq
+
+
+class EffectStore(object):
+    """
+    Effects of one combatant.
+
+     effects - {effect id: {'Stat', 'Amount', 'Expires', 'Source'}}
+               'Expires' is the turn the effect ends on, None if permanent
+     next_id - id the next effect will get
+     turn - this store's turn counter, advanced by advance()
+     dirty - set by every change that has to be saved
+    """
+    def __init__(self, effects=None, next_id=1, turn=0):
+        self.effects = dict(effects or {})
+        self.next_id = max(next_id, max(self.effects, default=0) + 1)
+        self.turn = turn
+        self.dirty = False
+        # heap of (expiry turn, effect id)
+        self._expiry = [(effect['Expires'], effectid) for effectid, effect in self.effects.items()
+                        if effect['Expires'] is not None]
+        heapq.heapify(self._expiry)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Load from to_dict() output, or from the old {id: {'Duration': ...}} mapping."""
+        data = data or {}
+        if 'effects' in data:
+            return cls({effectid: dict(effect) for effectid, effect in data['effects'].items()},
+                       data['next_id'], data['turn'])
+        effects = {}
+        for effectid, effect in data.items():
+            effect = dict(effect)
+            duration = effect.pop('Duration', -1)
+            effect['Expires'] = duration if duration > 0 else None
+            effects[effectid] = effect
+        store = cls(effects)
+        # written back in the new form on the next flush
+        store.dirty = bool(effects)
+        return store
+
+    def to_dict(self):
+        return {'next_id': self.next_id, 'turn': self.turn,
+                'effects': {effectid: dict(effect) for effectid, effect in self.effects.items()}}
+
+    def copy(self):
+        store = EffectStore.__new__(EffectStore)
+        store.effects = {effectid: dict(effect) for effectid, effect in self.effects.items()}
+        store.next_id = self.next_id
+        store.turn = self.turn
+        store._expiry = list(self._expiry)
+        store.dirty = self.dirty
+        return store
+
+    def add(self, stat, amount, duration=-1, source=None):
+        """Add an effect lasting duration turns (forever if not positive).  Returns (id, effect)."""
+        effectid = self.next_id
+        self.next_id += 1
+        expires = self.turn + duration if duration > 0 else None
+        effect = {'Stat': stat, 'Amount': amount, 'Expires': expires, 'Source': source}
+        self.effects[effectid] = effect
+        if expires is not None:
+            heapq.heappush(self._expiry, (expires, effectid))
+        self.dirty = True
+        return effectid, effect
+
+    def remove(self, effectid):
+        """Remove and return an effect; its expiry entry is dropped lazily."""
+        effect = self.effects.pop(effectid, None)
+        if effect is not None:
+            self.dirty = True
+        return effect
+
+    def advance(self):
+        """Move to the next turn and return the effects that expired."""
+        # without timed effects the turn counter means nothing, so it needs no write
+        if self._expiry:
+            self.dirty = True
+        self.turn += 1
+        expired = []
+        while self._expiry and self._expiry[0][0] <= self.turn:
+            expires, effectid = heapq.heappop(self._expiry)
+            effect = self.effects.get(effectid)
+            if effect is not None and effect['Expires'] == expires:
+                expired.append(self.effects.pop(effectid))
+        return expired
+
+    def clear(self):
+        """Remove and return every effect."""
+        cleared = list(self.effects.values())
+        if cleared:
+            self.dirty = True
+        self.effects = {}
+        self._expiry = []
+        return cleared
+
+    def remaining(self, effectid):
+        """Turns left on an effect, or None if it is permanent."""
+        expires = self.effects[effectid]['Expires']
+        return None if expires is None else expires - self.turn
+
+    def values(self):
+        return self.effects.values()
+
+    def items(self):
+        return self.effects.items()
+
+    def __contains__(self, effectid):
+        return effectid in self.effects
+
+    def __iter__(self):
+        return iter(self.effects)
+
+    def __len__(self):
+        return len(self.effects)
@@ -1,4 +1,6 @@
 import cardsystem
+from cardsystem import registry
+from cardsystem.cache import LRUCache
 from evennia.utils import evtable
 import math
 
@@ -29,22 +31,34 @@ def pretty_list_objects(items):
     return pretty_list(newlist)
 
 def get_card_data(cardstring):
-    if not cardstring:
-        return None
-    cardsplit = cardstring.split('_')
-    carddata = dict(cardsystem.CARDS[cardsplit[0]][cardsplit[1]][cardsplit[2]])
-    if 'Inherits' in carddata.keys():
-        temp_carddata = dict(get_card_data(carddata['Inherits']))
-        for key in carddata.keys():
-            temp_carddata[key] = carddata[key]
-        carddata = temp_carddata
-    carddata['Name'] = cardsplit[2]
-    carddata['Rarity'] = cardsplit[1]
-    carddata['Set'] = cardsplit[0]
-    carddata['CardString'] = cardstring
-    return carddata
-
-def card_small(card):
+    """
+    Return the resolved, read-only record for cardstring.  Copy it with
+    dict() before modifying.
+    """
+    return registry.REGISTRY.get(cardstring)
+
+RENDER_CACHE = LRUCache(maxsize=1024, version=lambda: registry.REGISTRY.version)
+
+
+def _cached_render(render, card, style, width):
+    # the cached text is raw markup; colour and screenreader handling happen per session on output
+    key = (card['CardString'], style, width)
+    rendered = RENDER_CACHE.get(key)
+    if rendered is None:
+        rendered = str(render(card, width))
+        RENDER_CACHE.set(key, rendered)
+    return rendered
+
+
+def card_small(card, width=24):
+    return _cached_render(_render_card_small, card, 'small', width)
+
+
+def card_detail(card, width=55):
+    return _cached_render(_render_card_detail, card, 'detail', width)
+
+
+def _render_card_small(card, width):
     cardrarity = cardsystem.RARITIES[card['Rarity']]
     color = cardsystem.ELEMENTS[card['Element']]['Color']
     cardstats = evtable.EvTable(table=[[card['Effect']]],
@@ -54,7 +68,7 @@ def card_small(card):
                                 )
     cardfmt = evtable.EvTable(card['Name'],
                               table=[[cardstats]],
-                              width=24,
+                              width=width,
                               border='table',
                               corner_char=f'|{color}+|n',
                               border_left_char=f"|{color}{cardrarity['left_border']}|n",
@@ -65,7 +79,7 @@ def card_small(card):
                               )
     return cardfmt
 
-def card_detail(card):
+def _render_card_detail(card, width):
     keys = list(card.keys())
     keys.sort()
     cardrarity = cardsystem.RARITIES[card['Rarity']]
@@ -86,7 +100,7 @@ def card_detail(card):
     cardinterior = evtable.EvTable(header=False, table=[[cardstatsdisplay],[cardeffect]], border='incols')
     cardfmt = evtable.EvTable(card['Name'],
                               table=[[cardinterior]],
-                              width=55,
+                              width=width,
                               pad_width=0,
                               border='cells',
                               corner_char=f'|{color}+|n',
@@ -111,6 +125,47 @@ def card_small_multiple(cardlist, width=79, title="Your Deck"):
     cardmultiple = evtable.EvTable("", f'{title}', "", border=None, table=rows, align="c", valign="t")
     return cardmultiple
 
+def group_cards(cardlist, filter=None):
+    """
+    Collapse identical cards into (carddata, count) pairs, in order of first
+    appearance.  filter, if given, is matched case-insensitively against the
+    card's name, type and element.
+    """
+    counts = {}
+    for cardstring in cardlist:
+        counts[cardstring] = counts.get(cardstring, 0) + 1
+    groups = []
+    for cardstring, count in counts.items():
+        card = get_card_data(cardstring)
+        if filter:
+            haystack = f"{card['Name']} {card.get('Type', '')} {card.get('Element', '')}".lower()
+            if filter.lower() not in haystack:
+                continue
+        groups.append((card, count))
+    return groups
+
+def card_small_pages(cardlist, width=79, title="Your Deck", rows_per_page=2, filter=None, page=None):
+    """
+    Generator laying out cardlist one page at a time, with identical cards
+    grouped and counted.  Yields (page number, page count, table); if page
+    is given only that page is laid out.
+    """
+    colcount = max(1, int(width/26))
+    pagesize = colcount * rows_per_page
+    groups = group_cards(cardlist, filter=filter)
+    pagecount = max(1, math.ceil(len(groups) / pagesize))
+    pages = range(1, pagecount + 1) if page is None else [min(max(1, page), pagecount)]
+    for pagenum in pages:
+        columns = [[] for i in range(colcount)]
+        start = (pagenum - 1) * pagesize
+        for i, (card, count) in enumerate(groups[start:start + pagesize]):
+            cardformat = card_small(card)
+            if count > 1:
+                cardformat += f"\n{card['Name']} x{count}"
+            columns[i % colcount].append(cardformat)
+        pagetitle = f'{title} ({pagenum}/{pagecount})' if pagecount > 1 else title
+        yield pagenum, pagecount, evtable.EvTable("", pagetitle, "", border=None, table=columns, align="c", valign="t")
+
 def card_brief(card):
     color = cardsystem.ELEMENTS[card['Element']]['Color']
     cardrarity = cardsystem.RARITIES[card['Rarity']]
@@ -155,9 +210,4 @@ def combat_stats_multiple(characters, width=79, title="Combat Stats"):
     return statmultiple
 
 def find_card(holder, cardstring, pools=[]):
-    for pool in pools:
-        searchpool = list(holder.attributes.get(key=pool))
-        for i in range(len(searchpool)):
-            if searchpool[i] == cardstring:
-                return pool, i
-    return None, None
+    return holder.zones.find(cardstring, pools)
@@ -0,0 +1,130 @@
+"""
+Booster packs and bulk card rewards.
+
+A pack type is a dict in PACKS:
+
+    'set'    - the card set packs draw from
+    'slots'  - list of {'count': cards, 'rarities': {rarity: weight}}
+    'pity'   - {rarity: packs}: the rarity is guaranteed at least once
+               in every run of this many packs
+    'unique' - no card appears twice in the same pack unless a slot's
+               pool runs out of cards (default True)
+
+`PackGenerator` opens packs from a seeded RNG using the catalog's alias
+samplers, so each card costs O(1).  `grant_packs` opens packs for many
+characters and writes each character's new cards, stats and pity counters
+once, inside one transaction.  There is no separate card collection, so
+rewards go into the character's deck.
+"""
+import random
+from cardsystem import catalog
+
+PACKS = {
+    'standard': {
+        'set': 'Base',
+        'slots': [
+            {'count': 4, 'rarities': {'Common': 1}},
+            {'count': 1, 'rarities': {'Uncommon': 3, 'Rare': 1}},
+        ],
+        'pity': {'Rare': 8},
+    },
+}
+
+# Redraws tried when a card is already in the pack, before drawing from
+# the cards that are not.
+UNIQUE_RETRIES = 10
+
+
+def rarity_of(cardstring):
+    return cardstring.split('_', 2)[1]
+
+
+class PackGenerator(object):
+    """
+    Opens packs of one PACKS type.  Give a seed for a reproducible sequence.
+    """
+    def __init__(self, packtype='standard', seed=None):
+        self.packtype = packtype
+        self.config = PACKS[packtype]
+        self.rng = random.Random(seed)
+        self.unique = self.config.get('unique', True)
+        self.pity = dict(self.config.get('pity', {}))
+        setname = self.config['set']
+        # (count, sampler, rarities) per slot
+        self.slots = [(slot['count'], catalog.rarity_sampler(setname, slot['rarities']), set(slot['rarities']))
+                      for slot in self.config['slots']]
+        self.forced = {rarity: catalog.rarity_sampler(setname, {rarity: 1}) for rarity in self.pity}
+
+    def _draw(self, sampler, pack):
+        card = sampler.sample(self.rng)
+        if not self.unique or card not in pack:
+            return card
+        # redrawing is cheap and usually enough
+        for retry in range(0, UNIQUE_RETRIES):
+            card = sampler.sample(self.rng)
+            if card not in pack:
+                return card
+        # otherwise draw with the same weights from what is left
+        taken = set(pack)
+        remaining = [(item, weight) for item, weight in zip(sampler.items, sampler.weights)
+                     if weight > 0 and item not in taken]
+        if not remaining:
+            # every card of the pool is already in the pack
+            return card
+        items, weights = zip(*remaining)
+        return self.rng.choices(items, weights)[0]
+
+    def open(self, counters=None):
+        """
+        Open one pack and return its card strings.  counters is the
+        {rarity: packs without it} dict of the opener and is updated.
+        """
+        counters = {} if counters is None else counters
+        due = [rarity for rarity, limit in self.pity.items() if counters.get(rarity, 0) + 1 >= limit]
+        pack = []
+        for count, sampler, rarities in self.slots:
+            for i in range(0, count):
+                pack.append(self._draw(sampler, pack))
+        for rarity in due:
+            if any(rarity_of(card) == rarity for card in pack):
+                continue
+            # replace the last card of the last slot able to give this rarity
+            position = len(pack)
+            for count, sampler, rarities in reversed(self.slots):
+                if rarity in rarities:
+                    pack[position - 1] = self._draw(self.forced[rarity], pack[:position - 1] + pack[position:])
+                    break
+                position -= count
+        seen = {rarity_of(card) for card in pack}
+        for rarity in self.pity:
+            counters[rarity] = 0 if rarity in seen else counters.get(rarity, 0) + 1
+        return pack
+
+    def open_many(self, count, counters=None):
+        """Open count packs against the same pity counters."""
+        counters = {} if counters is None else counters
+        return [self.open(counters) for i in range(0, count)]
+
+
+def grant_packs(characters, packtype='standard', count=1, seed=None):
+    """
+    Open count packs for every character and add the cards to their decks.
+    Each character's zones, stats and pity counters are written once, all
+    in one transaction.  Returns {character id: [pack, ...]}.
+    """
+    from django.db import transaction
+    generator = PackGenerator(packtype, seed=seed)
+    opened = {}
+    with transaction.atomic():
+        for character in characters:
+            allpity = dict(character.attributes.get('pack_pity') or {})
+            counters = dict(allpity.get(packtype, {}))
+            packs = generator.open_many(count, counters)
+            cards = [card for pack in packs for card in pack]
+            character.zones.extend('card_deck', cards)
+            character.flush_zones()
+            character.update_stats(cards_in=cards)
+            allpity[packtype] = counters
+            character.db.pack_pity = allpity
+            opened[character.id] = packs
+    return opened
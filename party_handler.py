@@ -1,7 +1,89 @@
 import random
 from evennia import DefaultScript, CmdSet, create_script, Command
-from cardsystem.typeclasses import CardObject, CardCharacter, NPC
-from typeclasses.characters import Character
+from evennia.scripts.models import ScriptDB
+from cardsystem.typeclasses import is_player, is_npc
+
+PARTY_TYPECLASS = "cardsystem.party_handler.PartyHandler"
+
+
+class PartyRegistry(object):
+    """
+    Process-wide index of party membership: character id -> PartyHandler.
+
+    It is built from the database in one query the first time it is used
+    after a server start, and PartyHandler keeps it current as members
+    join and leave, so lookups never touch a handler's Attributes.
+    """
+    def __init__(self):
+        # {character id: party}, {party id: party}, {party id: set of character ids}
+        self._members = {}
+        self._parties = {}
+        self._rosters = {}
+        self._loaded = False
+
+    def rebuild(self):
+        """Reload every party's members with a single query."""
+        self._members = {}
+        self._parties = {}
+        self._rosters = {}
+        links = (ScriptDB.db_attributes.through.objects
+                 .filter(scriptdb__db_typeclass_path=PARTY_TYPECLASS, attribute__db_key='characters')
+                 .select_related('scriptdb', 'attribute'))
+        for link in links:
+            for characterid in (link.attribute.value or {}):
+                self._add(link.scriptdb, characterid)
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.rebuild()
+
+    def _add(self, party, characterid):
+        self._parties[party.id] = party
+        self._rosters.setdefault(party.id, set()).add(characterid)
+        self._members[characterid] = party
+
+    def add(self, party, character):
+        self._ensure_loaded()
+        self.remove(character)
+        self._add(party, character.id)
+
+    def remove(self, character):
+        self._ensure_loaded()
+        party = self._members.pop(character.id, None)
+        if party is not None:
+            roster = self._rosters[party.id]
+            roster.discard(character.id)
+            if not roster:
+                self.discard_party(party)
+
+    def discard_party(self, party):
+        self._ensure_loaded()
+        self._parties.pop(party.id, None)
+        for characterid in self._rosters.pop(party.id, ()):
+            self._members.pop(characterid, None)
+
+    def party_of(self, character):
+        """Return the party character (an object or an id) is in, or None."""
+        self._ensure_loaded()
+        return self._members.get(getattr(character, 'id', character))
+
+    def same_party(self, character, other):
+        party = self.party_of(character)
+        return party is not None and party == self.party_of(other)
+
+    def members(self, party):
+        """Return the ids of party's members."""
+        self._ensure_loaded()
+        return set(self._rosters.get(party.id, ()))
+
+    def parties(self):
+        self._ensure_loaded()
+        return list(self._parties.values())
+
+
+PARTIES = PartyRegistry()
+
 
 class PartyHandler(DefaultScript):
     """
@@ -28,23 +110,30 @@ class PartyHandler(DefaultScript):
             del character.ndb.party_invite
             del self.db.invites[dbref]
         character.ndb.party_handler = self
-        if character in Character.objects.all() or character in CardCharacter.objects.all():
+        self._update_combat_side(character)
+        if is_player(character):
             character.cmdset.add("cardsystem.party_handler.PartyCmdSet")
 
+    def _update_combat_side(self, character):
+        """Let a running combat know the character changed sides."""
+        chandler = character.ndb.combat_handler
+        if chandler:
+            chandler.update_side(character)
+
     def _init_invite(self, character):
         """
         This handles the adding of party invites
         """
         character.ndb.party_invite = self
-        if character in NPC.objects.all():
+        if is_npc(character):
             character.consider_invite()
-        elif character in Character.objects.all() or character in CardCharacter.objects.all():
+        elif is_player(character):
             character.cmdset.add("cardsystem.party_handler.PartyInviteeCmdSet")
 
     def _uninvite_character(self, character):
         dbref = character.id
         del self.db.invites[dbref]
-        if character in Character.objects.all() or character in CardCharacter.objects.all():
+        if is_player(character):
             character.cmdset.remove("cardsystem.party_handler.PartyInviteeCmdSet")
         del character.ndb.party_invite
 
@@ -56,10 +145,12 @@ class PartyHandler(DefaultScript):
         dbref = character.id
         if self.db.characters.get(dbref):
             del self.db.characters[dbref]
+            PARTIES.remove(character)
         if self.db.invites.get(dbref):
             self._uninvite_character(character)
         del character.ndb.party_handler
-        if character in Character.objects.all() or character in CardCharacter.objects.all():
+        self._update_combat_side(character)
+        if is_player(character):
             character.cmdset.remove("cardsystem.party_handler.PartyCmdSet")
 
     def _make_leader(self, character):
@@ -68,7 +159,7 @@ class PartyHandler(DefaultScript):
         and commands from previous leader
         """
         success = False
-        if character and (character in Character.objects.all() or character in CardCharacter.objects.all()):
+        if character and is_player(character):
             if self.db.party_leader:
                 self.db.party_leader.cmdset.delete("cardsystem.party_handler.LeaderCmdSet")
             self.db.party_leader = character
@@ -96,11 +187,13 @@ class PartyHandler(DefaultScript):
             self._cleanup_character(character)
         for character in list(self.db.invites.values()):
             self._cleanup_character(character)
+        PARTIES.discard_party(self)
 
     def add_character(self, character):
         """Add character to handler"""
         dbref = character.id
         self.db.characters[dbref] = character
+        PARTIES.add(self, character)
         # set up back-reference
         self._init_character(character)
 
@@ -324,7 +417,7 @@ class CmdPartyLeave(Command):
             del party[self.caller.id]
             pcs = {}
             for member in party.keys():
-                if party[member] in Character.objects.all() or party[member] in CardCharacter.objects.all():
+                if is_player(party[member]):
                     pcs[member] = party[member]
             if len(pcs) > 1:
                 self.caller.msg("Please assign a new leader first.  Usage: partyleader <member>")
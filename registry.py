@@ -0,0 +1,137 @@
+"""
+Compiled card registry.
+
+Card definitions in `cardsystem.CARDS` are resolved once (inheritance,
+Name/Rarity/Set/CardString) into frozen records keyed by card string.
+Lookups hand out read-only views, so callers must copy before modifying.
+A prebuilt snapshot (see cardsystem.snapshot) replaces the compile step,
+decoding each card on first lookup.
+"""
+import importlib
+from types import MappingProxyType
+import cardsystem
+from cardsystem import snapshot
+
+
+def _freeze(value):
+    """Recursively convert dicts and lists into read-only equivalents."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def resolve_catalog(cards):
+    """
+    Resolve a {set: {rarity: {title: data}}} catalog into plain, fully
+    inherited card dicts keyed by card string.
+    """
+    raw = {}
+    for setname, rarities in cards.items():
+        for rarity, titles in rarities.items():
+            for title, carddata in titles.items():
+                raw[f'{setname}_{rarity}_{title}'] = carddata
+    resolved = {}
+    for cardstring in raw:
+        _resolve(cardstring, raw, resolved, ())
+    return resolved
+
+
+def _resolve(cardstring, raw, resolved, chain):
+    if cardstring in resolved:
+        return resolved[cardstring]
+    if cardstring in chain:
+        raise ValueError(f"Circular card inheritance: {' -> '.join(chain + (cardstring,))}")
+    carddata = dict(raw[cardstring])
+    if 'Inherits' in carddata:
+        temp_carddata = dict(_resolve(carddata['Inherits'], raw, resolved, chain + (cardstring,)))
+        temp_carddata.update(carddata)
+        carddata = temp_carddata
+    setname, rarity, title = cardstring.split('_', 2)
+    carddata['Name'] = title
+    carddata['Rarity'] = rarity
+    carddata['Set'] = setname
+    carddata['CardString'] = cardstring
+    resolved[cardstring] = carddata
+    return carddata
+
+
+def thaw(value):
+    """Return a plain, mutable deep copy of a frozen value (see _freeze)."""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+class CardRegistry(object):
+    """
+    Resolves a card catalog into frozen card records.
+    """
+    def __init__(self, cards=None):
+        self._cards = {}
+        # bumped on every reload so derived caches know to drop their entries
+        self.version = 0
+        self.reload(cards)
+
+    def reload(self, cards=None, refresh=False, required=()):
+        """
+        (Re)compile the catalog.  Without cards, a snapshot that is newer
+        than cards.py is memory-mapped; otherwise cardsystem.CARDS is
+        compiled.  With refresh, cards.py is re-read from disk and the new
+        catalog must pass snapshot.validate.  Every card string in required
+        must exist in the new catalog.  ValueError is raised and the old
+        catalog kept if either check fails.
+
+        The new catalog is built completely before it replaces the old one
+        and the version is bumped, so lookups never see a mix of the two.
+        """
+        catalog = None
+        if cards is None:
+            catalog = snapshot.load_fresh()
+            if catalog is None:
+                module = importlib.import_module('cardsystem.cards')
+                cards = (importlib.reload(module) if refresh else module).CARDS
+        if catalog is None:
+            resolved = resolve_catalog(cards)
+            if refresh:
+                problems = snapshot.validate(resolved)
+                if problems:
+                    raise ValueError("Invalid card catalog:\n" + "\n".join(problems))
+            catalog = {cardstring: _freeze(carddata) for cardstring, carddata in resolved.items()}
+        missing = [cardstring for cardstring in required if cardstring not in catalog]
+        if missing:
+            if isinstance(catalog, snapshot.Snapshot):
+                catalog.close()
+            raise ValueError("Cards missing from the new catalog: " + ", ".join(missing))
+        old, self._cards = self._cards, catalog
+        if isinstance(old, snapshot.Snapshot):
+            old.close()
+        self.version += 1
+
+    def get(self, cardstring):
+        """
+        Return the read-only record for cardstring, or None if cardstring is empty.
+        Raises KeyError for unknown cards.
+        """
+        if not cardstring:
+            return None
+        return self._cards[cardstring]
+
+    def __contains__(self, cardstring):
+        return cardstring in self._cards
+
+    def __iter__(self):
+        return iter(self._cards)
+
+    def __len__(self):
+        return len(self._cards)
+
+
+REGISTRY = CardRegistry()
+
+
+def reload(cards=None, refresh=False, required=()):
+    REGISTRY.reload(cards, refresh=refresh, required=required)
@@ -0,0 +1,154 @@
+"""
+Precompiled card catalog snapshots.
+
+`build` validates the catalog, resolves inheritance and writes every card
+as its own JSON record, followed by an offset index.  `Snapshot` memory-maps
+such a file and decodes a card the first time it is looked up, so neither
+the catalog source nor the cards nobody uses are ever evaluated.
+
+Rebuild the snapshot after changing cards.py:
+
+    python -m cardsystem.snapshot [path]
+
+The registry ignores a snapshot older than cards.py.
+
+File layout (little-endian):
+
+    header  - magic, format version, card count, index offset
+    records - one UTF-8 JSON object per card
+    index   - per card: key length, key (UTF-8), record offset, record length
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping
+
+MAGIC = b'CSNP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHIQ')
+KEY_LENGTH = struct.Struct('<H')
+ENTRY = struct.Struct('<QI')
+
+SOURCE_PATH = os.path.join(os.path.dirname(__file__), 'cards.py')
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'cards.snapshot')
+
+# Keys whose values must be numbers when present.
+NUMERIC_KEYS = ('Damage', 'Defense', 'Amount', 'Duration', 'AttackMultiplier', 'DefenseMult',
+                'Strength', 'Reflexes', 'Health', 'Intelligence')
+
+
+def validate(resolved):
+    """Return a list of problems found in a resolved catalog."""
+    problems = []
+    for cardstring, carddata in resolved.items():
+        if not carddata.get('Type'):
+            problems.append(f"{cardstring}: no Type")
+        for key in NUMERIC_KEYS:
+            value = carddata.get(key)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                problems.append(f"{cardstring}: {key} is not a number")
+        for created in carddata.get('Create') or ():
+            if created not in resolved:
+                problems.append(f"{cardstring}: creates unknown card {created}")
+        try:
+            json.dumps(carddata)
+        except (TypeError, ValueError):
+            problems.append(f"{cardstring}: data is not JSON serializable")
+    return problems
+
+
+def build(cards=None, path=DEFAULT_PATH):
+    """
+    Validate and resolve cards (default cardsystem.CARDS) and write them to
+    a snapshot at path.  Raises ValueError if the catalog is invalid.
+    Returns the number of cards written.
+    """
+    from cardsystem import registry
+    if cards is None:
+        from cardsystem.cards import CARDS as cards
+    try:
+        resolved = registry.resolve_catalog(cards)
+    except KeyError as err:
+        raise ValueError(f"Card inherits from unknown card {err}")
+    problems = validate(resolved)
+    if problems:
+        raise ValueError("Invalid card catalog:\n" + "\n".join(problems))
+    records = bytearray()
+    index = bytearray()
+    for cardstring in sorted(resolved):
+        record = json.dumps(resolved[cardstring], separators=(',', ':')).encode('utf-8')
+        key = cardstring.encode('utf-8')
+        index += KEY_LENGTH.pack(len(key)) + key + ENTRY.pack(HEADER.size + len(records), len(record))
+        records += record
+    temppath = path + '.tmp'
+    with open(temppath, 'wb') as snapfile:
+        snapfile.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(resolved), HEADER.size + len(records)))
+        snapfile.write(records)
+        snapfile.write(index)
+    os.replace(temppath, path)
+    return len(resolved)
+
+
+class Snapshot(Mapping):
+    """
+    Read-only {card string: frozen card record} view of a snapshot file.
+    Records are decoded on first access and kept.
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        # imported here because the registry loads snapshots while it is being imported
+        from cardsystem.registry import _freeze
+        self._freeze = _freeze
+        with open(path, 'rb') as snapfile:
+            self._mmap = mmap.mmap(snapfile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, index_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} card snapshot.")
+        self._index = {}
+        self._decoded = {}
+        data = self._mmap
+        position = index_offset
+        for i in range(0, count):
+            keylength, = KEY_LENGTH.unpack_from(data, position)
+            position += KEY_LENGTH.size
+            key = data[position:position + keylength].decode('utf-8')
+            position += keylength
+            self._index[key] = ENTRY.unpack_from(data, position)
+            position += ENTRY.size
+
+    def __getitem__(self, cardstring):
+        record = self._decoded.get(cardstring)
+        if record is None:
+            offset, length = self._index[cardstring]
+            record = self._freeze(json.loads(self._mmap[offset:offset + length]))
+            self._decoded[cardstring] = record
+        return record
+
+    def __contains__(self, cardstring):
+        return cardstring in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def close(self):
+        self._mmap.close()
+
+
+def load_fresh(path=DEFAULT_PATH, source=SOURCE_PATH):
+    """Return a Snapshot of path if it exists and is not older than source, else None."""
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(source):
+            return None
+        return Snapshot(path)
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    print(f"Wrote {build(path=path)} cards to {path}.")
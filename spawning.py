@@ -0,0 +1,257 @@
+"""
+Bulk NPC spawning and recycling.
+
+Every NPC spawned from the same prototype starts with the same cards in
+play and the same stats; only its deck order differs.  `spawn_npcs`
+works that state out once per prototype with the core rules, gives each
+copy its own shuffle and creates all of them in one transaction, instead
+of having every NPC equip, recompute and shuffle itself after creation.
+
+Dead NPCs are not deleted but reset and parked in `POOL`; spawning takes
+parked NPCs of the right prototype before creating new objects.
+
+Loot is spawned through `LOOT`, which collects the drops of every death in
+the same tick into one spawner call.  Loot prototypes are copied out of
+the catalog and validated once per card.
+"""
+import copy
+import random
+from django.db import transaction
+from evennia.objects.models import ObjectDB
+from evennia.prototypes import prototypes as protlib
+from evennia.prototypes import spawner
+from evennia.typeclasses.tags import Tag
+from evennia.utils import logger
+from evennia.utils.utils import delay
+from cardsystem import core, registry, stats
+from cardsystem.cache import LRUCache
+from cardsystem.effects import EffectStore
+from cardsystem.zones import CardZones, ZONES
+
+# Attributes the prepared card state replaces in a stamped prototype.
+CARD_ATTRIBUTES = ZONES + ('card_zones', 'stats', 'card_effects')
+
+# Tag category of parked NPCs; the tag key is their prototype key.
+POOL_CATEGORY = 'cardsystem_pool'
+# Most dormant NPCs kept per prototype; more are deleted.
+POOL_SIZE = 50
+
+_TEMPLATES = LRUCache(128, version=lambda: registry.REGISTRY.version)
+# {cardstring: validated loot prototype, or False if the card has none or it is invalid}
+_LOOT = LRUCache(1024, version=lambda: registry.REGISTRY.version)
+
+
+def _flatten(prototype):
+    if isinstance(prototype, str):
+        found = protlib.search_prototype(key=prototype)
+        if not found:
+            raise KeyError(f"No prototype named {prototype}.")
+        prototype = found[0]
+    return spawner.flatten_prototype(prototype)
+
+
+def _attribute(prototype, key):
+    """Read an attribute value from a flattened prototype."""
+    if key in prototype:
+        return prototype[key]
+    for attr in prototype.get('attrs', ()):
+        if attr[0] == key:
+            return attr[1]
+    return None
+
+
+def npc_template(prototype):
+    """
+    Return (flattened prototype, prepared CombatantState) for prototype,
+    a prototype dict or key.  Keyed prototypes are cached until the card
+    catalog changes.
+    """
+    cachekey = prototype if isinstance(prototype, str) else prototype.get('prototype_key')
+    template = _TEMPLATES.get(cachekey) if cachekey else None
+    if template is None:
+        flat = _flatten(prototype)
+        zones = CardZones()
+        for zone in ZONES:
+            zones.extend(zone, _attribute(flat, zone) or [])
+        state = core.CombatantState(None, flat.get('key'), stats.new_stats(), zones, EffectStore())
+        # the shuffle is redone per copy, so the template's order does not matter
+        core.prepare(state)
+        attrs = [attr for attr in flat.get('attrs', ()) if attr[0] not in CARD_ATTRIBUTES]
+        flat = {key: value for key, value in flat.items() if key not in CARD_ATTRIBUTES}
+        flat['attrs'] = attrs
+        template = (flat, state)
+        if cachekey:
+            _TEMPLATES.set(cachekey, template)
+    return template
+
+
+def spawn_npcs(prototype, count, location=None, rng=random):
+    """
+    Spawn count NPCs from prototype (a prototype dict or key) and return
+    them.  Parked NPCs of the prototype are reused first; the rest are
+    created in a single transaction.
+    """
+    flat, state = npc_template(prototype)
+    npcs = []
+    if flat.get('prototype_key'):
+        npcs = POOL.acquire(flat['prototype_key'], count, location)
+    prototypes = []
+    for i in range(len(npcs), count):
+        npc_state = state.copy()
+        core.shuffle(npc_state, withdiscard=False, rng=rng)
+        stamped = dict(flat)
+        stamped['attrs'] = flat['attrs'] + [('card_zones', npc_state.zones.to_bytes(), None, ''),
+                                            ('stats', npc_state.stats, None, ''),
+                                            ('card_effects', npc_state.effects.to_dict(), None, '')]
+        if location is not None:
+            stamped['location'] = location
+        prototypes.append(stamped)
+    if prototypes:
+        with transaction.atomic():
+            npcs.extend(spawner.spawn(*prototypes))
+    return npcs
+
+
+class NPCPool(object):
+    """
+    Dormant NPCs waiting to be reused, by prototype key.
+
+    A parked NPC has no location and carries its prototype key as a tag in
+    POOL_CATEGORY, so the pool is rebuilt from one tag query the first time
+    it is used after a server start.
+    """
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self._dormant = {}
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._dormant = {}
+            for prototype_key, npcid in (Tag.objects.filter(db_category=POOL_CATEGORY)
+                                         .values_list('db_key', 'objectdb__id')):
+                if npcid is not None:
+                    self._dormant.setdefault(prototype_key, []).append(npcid)
+            self._loaded = True
+
+    def count(self, prototype_key):
+        self._ensure_loaded()
+        return len(self._dormant.get(prototype_key, ()))
+
+    def park(self, npc, prototype_key):
+        """Reset npc to a fresh copy of its prototype and take it out of the world."""
+        self._ensure_loaded()
+        reset_npc(npc, prototype_key)
+        npc.location = None
+        npc.tags.add(prototype_key, category=POOL_CATEGORY)
+        self._dormant.setdefault(prototype_key, []).append(npc.id)
+
+    def acquire(self, prototype_key, count, location=None):
+        """Reactivate up to count parked NPCs of prototype_key and return them."""
+        self._ensure_loaded()
+        dormant = self._dormant.get(prototype_key, [])
+        npcids = [dormant.pop() for i in range(0, min(count, len(dormant)))]
+        npcs = list(ObjectDB.objects.filter(id__in=npcids))
+        for npc in npcs:
+            npc.tags.remove(prototype_key, category=POOL_CATEGORY)
+            npc.ndb.dying = False
+            if location is not None:
+                npc.move_to(location, quiet=True)
+        return npcs
+
+
+POOL = NPCPool()
+
+
+def prototype_key_of(npc):
+    key = npc.tags.get(category='from_prototype')
+    if isinstance(key, list):
+        key = key[0]
+    return key
+
+
+def reset_npc(npc, prototype_key):
+    """Give npc the prepared cards, stats and effects of its prototype, freshly shuffled."""
+    flat, state = npc_template(prototype_key)
+    state = state.copy()
+    core.shuffle(state, withdiscard=False)
+    npc.ndb.card_zones = None
+    npc.ndb.card_effects = None
+    npc.db.card_zones = state.zones.to_bytes()
+    npc.db.stats = state.stats
+    npc.db.card_effects = state.effects.to_dict()
+
+
+def recycle(npc):
+    """
+    Retire a dead NPC: park it in the pool for its prototype, or delete it
+    if it was not spawned from a prototype or the pool is full.
+    """
+    if chandler := npc.ndb.combat_handler:
+        chandler.remove_character(npc)
+    if phandler := npc.ndb.party_handler:
+        phandler.remove_character(npc)
+    prototype_key = prototype_key_of(npc)
+    if not prototype_key or POOL.count(prototype_key) >= POOL.size:
+        npc.delete()
+        return False
+    POOL.park(npc, prototype_key)
+    return True
+
+
+def loot_prototype(cardstring):
+    """
+    Return the validated loot prototype of a card as a plain dict owned by
+    the cache, or None.  Callers must copy it before changing it.
+    """
+    prototype = _LOOT.get(cardstring)
+    if prototype is None:
+        prototype = False
+        loot = registry.REGISTRY.get(cardstring).get('Loot')
+        if loot:
+            prototype = registry.thaw(loot)
+            try:
+                # catalog loot has no prototype_key of its own
+                protlib.validate_prototype(prototype, protkey=cardstring)
+            except RuntimeError as err:
+                logger.log_err(f"Invalid Loot prototype on {cardstring}: {err}")
+                prototype = False
+        _LOOT.set(cardstring, prototype)
+    return prototype or None
+
+
+class LootQueue(object):
+    """
+    Loot waiting to be spawned.  The first drop queued in a tick schedules
+    a flush, which spawns everything queued until then in one call.
+    """
+    def __init__(self):
+        self._pending = []
+        self._scheduled = False
+
+    def add(self, cardstring, location, source=None):
+        """Queue the loot of cardstring to appear at location, announced as dropped by source."""
+        prototype = loot_prototype(cardstring)
+        if prototype is None or location is None:
+            return False
+        self._pending.append((prototype, location, source))
+        if not self._scheduled:
+            self._scheduled = True
+            delay(0, self.flush)
+        return True
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        self._scheduled = False
+        if not pending:
+            return []
+        prototypes = [dict(copy.deepcopy(prototype), location=location) for prototype, location, source in pending]
+        with transaction.atomic():
+            objs = spawner.spawn(*prototypes)
+        for obj, (prototype, location, source) in zip(objs, pending):
+            if source:
+                location.msg_contents(f'{source} dropped {obj.get_numbered_name(1, location)[0]}.')
+        return objs
+
+
+LOOT = LootQueue()
@@ -0,0 +1,76 @@
+"""
+Stat aggregation.
+
+A character's stats are the base value plus the contribution of every card
+it owns (Max and Cur) and of every active effect (Mod).  Contributions are
+applied as deltas when a card enters or leaves the owned zones or an effect
+is added or expires; `recompute` rebuilds them from scratch and is only
+meant as a verification path.
+"""
+from cardsystem import registry
+
+STATS = ('Strength', 'Reflexes', 'Health', 'Intelligence')
+BASE_STAT = 10
+
+# {cardstring: bonuses} for catalog version _card_bonuses_version
+_card_bonuses = {}
+_card_bonuses_version = None
+
+
+def new_stats():
+    return {stat: {'Max': BASE_STAT, 'Cur': BASE_STAT, 'Mod': 0} for stat in STATS}
+
+
+def copy_stats(stats):
+    """Detach a (possibly Attribute-backed) stat dict so it can be changed and saved in one write."""
+    return {stat: dict(values) for stat, values in stats.items()}
+
+
+def card_bonuses(cardstring):
+    """Return the (stat, amount) pairs a card contributes, cached per card string."""
+    global _card_bonuses_version
+    if _card_bonuses_version != registry.REGISTRY.version:
+        _card_bonuses.clear()
+        _card_bonuses_version = registry.REGISTRY.version
+    bonuses = _card_bonuses.get(cardstring)
+    if bonuses is None:
+        carddata = registry.REGISTRY.get(cardstring)
+        bonuses = tuple((stat, carddata[stat]) for stat in STATS if carddata.get(stat))
+        _card_bonuses[cardstring] = bonuses
+    return bonuses
+
+
+def add_cards(stats, cardstrings, sign=1):
+    for cardstring in cardstrings:
+        for stat, amount in card_bonuses(cardstring):
+            if stat in stats:
+                stats[stat]['Max'] += sign * amount
+                stats[stat]['Cur'] += sign * amount
+
+
+def remove_cards(stats, cardstrings):
+    add_cards(stats, cardstrings, sign=-1)
+
+
+def add_effects(stats, effects, sign=1):
+    for effect in effects:
+        if effect['Stat'] in stats:
+            stats[effect['Stat']]['Mod'] += sign * effect['Amount']
+
+
+def remove_effects(stats, effects):
+    add_effects(stats, effects, sign=-1)
+
+
+def recompute(stats, cardstrings, effects):
+    """
+    Rebuild stats from scratch, keeping the current damage (Max - Cur) of
+    each stat.  Returns a new stat dict.
+    """
+    newstats = {}
+    for stat, values in stats.items():
+        statdif = values['Max'] - values['Cur']
+        newstats[stat] = {'Max': BASE_STAT, 'Cur': BASE_STAT - statdif, 'Mod': 0}
+    add_cards(newstats, cardstrings)
+    add_effects(newstats, effects)
+    return newstats
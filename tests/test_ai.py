@@ -0,0 +1,45 @@
+"""
+Tests for the NPC decision engines.
+"""
+from unittest import TestCase
+from cardsystem import ai, core, stats
+from cardsystem.effects import EffectStore
+from cardsystem.zones import CardInterner, CardZones
+
+
+def make_states(hand):
+    interner = CardInterner()
+    states = {}
+    for key in (1, 2):
+        zones = CardZones(interner=interner)
+        states[key] = core.CombatantState(key, f'NPC {key}', stats.new_stats(), zones, EffectStore())
+    states[1].zones.set_cards('card_hand', hand)
+    return states
+
+
+class TestEngines(TestCase):
+    def test_options(self):
+        states = make_states(['Base_Common_Block', 'Base_Common_Punch', 'Base_Common_Punch'])
+        self.assertEqual(ai.options(1, states[1], [1], [2]),
+                         [('Base_Common_Block', [1]), ('Base_Common_Punch', [2])])
+        self.assertEqual(ai.options(1, states[1], [1], []), [('Base_Common_Block', [1])])
+
+    def test_first_card(self):
+        states = make_states(['Base_Common_Block', 'Base_Common_Punch'])
+        self.assertEqual(ai.FirstCardAI().decide(1, states, [1], [2]), ('Base_Common_Block', [1]))
+        self.assertEqual(ai.FirstCardAI().decide(1, make_states([]), [1], [2]), (None, []))
+
+    def test_lookahead_prefers_damage(self):
+        engine = ai.LookaheadAI()
+        states = make_states(['Base_Common_Block', 'Base_Common_Punch'])
+        self.assertEqual(engine.decide(1, states, [1], [2]), ('Base_Common_Punch', [2]))
+        # the same situation again is answered from the memo
+        misses = engine.memo.misses
+        engine.decide(1, make_states(['Base_Common_Block', 'Base_Common_Punch']), [1], [2])
+        self.assertEqual(engine.memo.misses, misses)
+
+    def test_budget(self):
+        engine = ai.LookaheadAI(budget=0)
+        states = make_states(['Base_Common_Block', 'Base_Common_Punch'])
+        self.assertEqual(engine.decide(1, states, [1], [2]), ('Base_Common_Block', [1]))
+        self.assertEqual(engine.timeouts, 1)
@@ -0,0 +1,27 @@
+"""
+Tests for the LRU cache.
+"""
+from unittest import TestCase
+from cardsystem.cache import LRUCache
+
+
+class TestLRUCache(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.info(), {'hits': 3, 'misses': 1, 'size': 2, 'maxsize': 2})
+
+    def test_version_change_clears(self):
+        version = [1]
+        cache = LRUCache(version=lambda: version[0])
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        version[0] = 2
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+        self.assertEqual(len(cache), 0)
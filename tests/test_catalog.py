@@ -0,0 +1,54 @@
+"""
+Tests for the catalog indexes and weighted sampling.
+"""
+import random
+from collections import Counter
+from unittest import TestCase
+from cardsystem import catalog
+
+
+class TestCardIndex(TestCase):
+    def test_query(self):
+        index = catalog.index()
+        self.assertEqual(index.query(Set='Temp'), ('Temp_Common_Slash', 'Temp_Common_Jab', 'Temp_Common_Crush'))
+        self.assertEqual(index.query(Set='Base', Rarity='Common', Type='Weapon', stat='Reflexes'),
+                         ('Base_Common_Pitchfork',))
+        self.assertEqual(index.query(Set='Nowhere'), ())
+        self.assertEqual(index.query(), ())
+        self.assertIn('Temp', index.values('Set'))
+
+
+class TestAliasSampler(TestCase):
+    def test_distribution(self):
+        sampler = catalog.AliasSampler('abc', [1, 2, 7])
+        counts = Counter(sampler.samples(100000, rng=random.Random(0)))
+        for item, expected in (('a', 0.1), ('b', 0.2), ('c', 0.7)):
+            self.assertAlmostEqual(counts[item] / 100000, expected, delta=0.01)
+
+    def test_zero_weight_never_drawn(self):
+        sampler = catalog.AliasSampler('ab', [0, 1])
+        self.assertEqual(set(sampler.samples(1000, rng=random.Random(0))), {'b'})
+
+    def test_no_weight(self):
+        with self.assertRaises(ValueError):
+            catalog.AliasSampler('ab', [0, 0])
+        with self.assertRaises(ValueError):
+            catalog.AliasSampler([], [])
+
+
+class TestRaritySampler(TestCase):
+    def test_rarity_weights(self):
+        sampler = catalog.rarity_sampler('Base', {'Common': 3, 'Rare': 1})
+        counts = Counter(card.split('_')[1] for card in sampler.samples(40000, rng=random.Random(0)))
+        self.assertEqual(set(counts), {'Common', 'Rare'})
+        self.assertAlmostEqual(counts['Rare'] / 40000, 0.25, delta=0.01)
+        self.assertIs(catalog.rarity_sampler('Base', {'Rare': 1, 'Common': 3}), sampler)
+
+    def test_missing_rarities_are_skipped(self):
+        # the Temp set only has commons
+        sampler = catalog.rarity_sampler('Temp', catalog.FILL_RARITY_WEIGHTS)
+        self.assertEqual(set(sampler.samples(200, rng=random.Random(0))), set(catalog.index().query(Set='Temp')))
+
+    def test_nothing_to_draw(self):
+        with self.assertRaisesRegex(ValueError, 'Temp.*Rare'):
+            catalog.rarity_sampler('Temp', {'Rare': 1})
@@ -0,0 +1,64 @@
+"""
+Tests for the headless combat rules.
+"""
+import random
+from unittest import TestCase
+from cardsystem import core, stats
+from cardsystem.effects import EffectStore
+from cardsystem.zones import CardInterner, CardZones
+
+
+def make_state(key, hand=(), deck=(), played=()):
+    zones = CardZones(interner=CardInterner())
+    zones.set_cards('card_hand', hand)
+    zones.set_cards('card_deck', deck)
+    zones.set_cards('card_played', played)
+    return core.CombatantState(key, f'Combatant {key}', stats.new_stats(), zones, EffectStore())
+
+
+class TestDefense(TestCase):
+    def test_defense_value_matches_state(self):
+        state = make_state(1)
+        state.stats['Strength']['Cur'] = 25
+        self.assertEqual(core.defense_value(state.stats, state.zones), 2)
+        self.assertEqual(core.defense(state), 2)
+
+
+class TestRules(TestCase):
+    def test_draw_reshuffles_discard(self):
+        state = make_state(1, deck=['Base_Common_Punch'])
+        state.zones.set_cards('card_discard', ['Base_Common_Kick'])
+        events = core.draw(state, 2, rng=random.Random(0))
+        self.assertEqual(sorted(state.zones.cards('card_hand')), ['Base_Common_Kick', 'Base_Common_Punch'])
+        self.assertEqual(events[0]['event'], 'msg')
+
+    def test_play_creates_cards(self):
+        state = make_state(1, hand=['Base_Common_Rusty Knife'])
+        core.play(state, 0, rng=random.Random(0))
+        self.assertEqual(state.zones.cards('card_played'), ['Base_Common_Rusty Knife'])
+        self.assertEqual(sorted(state.zones.cards('card_deck')),
+                         ['Temp_Common_Jab', 'Temp_Common_Jab', 'Temp_Common_Slash'])
+        core.leaveplay(state, 0)
+        self.assertEqual(state.zones.cards('card_deck'), [])
+        self.assertEqual(state.zones.cards('card_discard'), ['Base_Common_Rusty Knife'])
+
+    def test_effects_change_mod(self):
+        state = make_state(1)
+        core.add_effect(state, 'Strength', 2, duration=1)
+        self.assertEqual(core.get_stat(state, 'Strength'), (12, 10))
+        core.countdown_effects(state)
+        self.assertEqual(core.get_stat(state, 'Strength'), (10, 10))
+
+    def test_resolve_turn_attack(self):
+        states = {1: make_state(1, hand=['Base_Common_Punch']), 2: make_state(2)}
+        actions = {1: [{'card': 'Base_Common_Punch', 'targets': [2]}], 2: [{'card': None, 'targets': []}]}
+        newstates, events = core.resolve_turn(states, actions, rng=random.Random(0))
+        attack = [event for event in events if event['event'] == 'attack'][0]
+        # 3 damage at Strength 10, less the target's defense of 1
+        self.assertEqual(attack['damage'], 2)
+        self.assertEqual(newstates[2].stats['Health']['Cur'], 8)
+        self.assertEqual(newstates[1].zones.cards('card_discard'), ['Base_Common_Punch'])
+        self.assertIn({'event': 'nothing', 'actor': 2}, events)
+        # the states passed in are left alone
+        self.assertEqual(states[2].stats['Health']['Cur'], 10)
+        self.assertEqual(states[1].zones.cards('card_hand'), ['Base_Common_Punch'])
@@ -0,0 +1,53 @@
+"""
+Tests for the effect store.
+"""
+from unittest import TestCase
+from cardsystem.effects import EffectStore
+
+
+class TestEffectStore(TestCase):
+    def test_round_trip(self):
+        store = EffectStore()
+        store.add('Strength', 2, duration=2, source=1)
+        store.add('Health', -1)
+        store.advance()
+        loaded = EffectStore.from_dict(store.to_dict())
+        self.assertEqual(loaded.to_dict(), store.to_dict())
+        self.assertFalse(loaded.dirty)
+        # the expiry index is rebuilt, so the timed effect still runs out
+        self.assertEqual([effect['Stat'] for effect in loaded.advance()], ['Strength'])
+        self.assertEqual(loaded.add('Reflexes', 1)[0], 3)
+
+    def test_legacy_format(self):
+        store = EffectStore.from_dict({1: {'Stat': 'Strength', 'Amount': 1, 'Duration': 2, 'Source': None},
+                                       4: {'Stat': 'Health', 'Amount': 3, 'Duration': -1, 'Source': None}})
+        self.assertTrue(store.dirty)
+        self.assertEqual(store.remaining(1), 2)
+        self.assertIsNone(store.remaining(4))
+        self.assertEqual(store.next_id, 5)
+
+    def test_expiry(self):
+        store = EffectStore()
+        short, effect = store.add('Strength', 1, duration=1)
+        longer, effect = store.add('Strength', 1, duration=3)
+        store.remove(short)
+        self.assertEqual(store.advance(), [])
+        self.assertEqual(store.remaining(longer), 2)
+        store.advance()
+        self.assertEqual(len(store.advance()), 1)
+        self.assertEqual(len(store), 0)
+
+    def test_dirty(self):
+        store = EffectStore()
+        store.advance()
+        self.assertFalse(store.dirty)
+        store.add('Strength', 1, duration=1)
+        self.assertTrue(store.dirty)
+        copied = store.copy()
+        self.assertTrue(copied.dirty)
+        store.dirty = False
+        store.advance()
+        self.assertTrue(store.dirty)
+        store.dirty = False
+        self.assertEqual(store.clear(), [])
+        self.assertFalse(store.dirty)
@@ -0,0 +1,61 @@
+"""
+Tests for booster pack generation.
+"""
+from unittest import TestCase
+from unittest.mock import patch
+from cardsystem import catalog, packs
+from cardsystem.packs import PackGenerator, rarity_of
+
+TEMP_PACKS = {
+    'temp': {'set': 'Temp', 'slots': [{'count': 3, 'rarities': {'Common': 1}}]},
+    'oversized': {'set': 'Temp', 'slots': [{'count': 4, 'rarities': {'Common': 1}}]},
+}
+
+
+class TestPackGenerator(TestCase):
+    def test_standard_packs_are_unique(self):
+        for seed in range(0, 5):
+            for pack in PackGenerator(seed=seed).open_many(2000):
+                self.assertEqual(len(set(pack)), len(pack))
+
+    def test_fallback_draws_remaining_cards(self):
+        temp = set(catalog.index().query(Set='Temp'))
+        with patch.dict(packs.PACKS, TEMP_PACKS), patch.object(packs, 'UNIQUE_RETRIES', 0):
+            generator = PackGenerator('temp', seed=0)
+            for pack in generator.open_many(200):
+                self.assertEqual(sorted(pack), sorted(temp))
+
+    def test_exhausted_pool_allows_duplicates(self):
+        temp = set(catalog.index().query(Set='Temp'))
+        with patch.dict(packs.PACKS, TEMP_PACKS):
+            pack = PackGenerator('oversized', seed=0).open()
+        self.assertEqual(len(pack), 4)
+        self.assertEqual(set(pack), temp)
+
+    def test_slots(self):
+        pack = PackGenerator(seed=0).open()
+        self.assertEqual(len(pack), 5)
+        self.assertEqual({rarity_of(card) for card in pack[:4]}, {'Common'})
+        self.assertIn(rarity_of(pack[4]), ('Uncommon', 'Rare'))
+
+    def test_pity(self):
+        limit = packs.PACKS['standard']['pity']['Rare']
+        for seed in range(0, 5):
+            generator = PackGenerator(seed=seed)
+            counters = {}
+            without = 0
+            for i in range(0, 500):
+                pack = generator.open(counters)
+                without = 0 if any(rarity_of(card) == 'Rare' for card in pack) else without + 1
+                self.assertLess(without, limit)
+                self.assertEqual(counters['Rare'], without)
+
+    def test_pity_forces_rare(self):
+        counters = {'Rare': packs.PACKS['standard']['pity']['Rare'] - 1}
+        pack = PackGenerator(seed=0).open(counters)
+        self.assertEqual(rarity_of(pack[-1]), 'Rare')
+        self.assertEqual(len(set(pack)), len(pack))
+        self.assertEqual(counters, {'Rare': 0})
+
+    def test_seeded(self):
+        self.assertEqual(PackGenerator(seed=3).open_many(10), PackGenerator(seed=3).open_many(10))
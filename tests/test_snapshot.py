@@ -0,0 +1,68 @@
+"""
+Tests for catalog snapshots.
+"""
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from cardsystem import registry, snapshot
+
+CARDS = {
+    'Test': {
+        'Common': {
+            'Strike': {'Element': 'Neutral', 'Type': 'Attack', 'Damage': 2, 'Create': ['Test_Common_Heavy Strike']},
+            'Heavy Strike': {'Inherits': 'Test_Common_Strike', 'Damage': 4, 'Create': []},
+        },
+    },
+}
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, 'cards.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_round_trip(self):
+        self.assertEqual(snapshot.build(CARDS, self.path), 2)
+        snap = snapshot.Snapshot(self.path)
+        try:
+            resolved = registry.resolve_catalog(CARDS)
+            self.assertEqual(sorted(snap), sorted(resolved))
+            for cardstring, carddata in resolved.items():
+                self.assertEqual(registry.thaw(snap[cardstring]), carddata)
+            heavy = snap['Test_Common_Heavy Strike']
+            self.assertEqual((heavy['Damage'], heavy['Element'], heavy['Name']), (4, 'Neutral', 'Heavy Strike'))
+            self.assertIs(snap['Test_Common_Strike'], snap['Test_Common_Strike'])
+            self.assertNotIn('Test_Common_Missing', snap)
+        finally:
+            snap.close()
+
+    def test_invalid_catalog(self):
+        cards = {'Test': {'Common': {'Broken': {'Damage': 'lots', 'Create': ['Test_Common_Missing']}}}}
+        with self.assertRaises(ValueError):
+            snapshot.build(cards, self.path)
+        self.assertFalse(os.path.exists(self.path))
+        problems = snapshot.validate(registry.resolve_catalog(cards))
+        self.assertEqual(len(problems), 3)
+
+    def test_load_fresh(self):
+        snapshot.build(CARDS, self.path)
+        source = os.path.join(self.tempdir, 'cards.py')
+        with open(source, 'w') as sourcefile:
+            sourcefile.write('CARDS = {}\n')
+        stat = os.stat(self.path)
+        os.utime(source, (stat.st_atime, stat.st_mtime + 10))
+        self.assertIsNone(snapshot.load_fresh(self.path, source))
+        os.utime(source, (stat.st_atime, stat.st_mtime - 10))
+        snap = snapshot.load_fresh(self.path, source)
+        self.assertEqual(len(snap), 2)
+        snap.close()
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as snapfile:
+            snapfile.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            snapshot.Snapshot(self.path)
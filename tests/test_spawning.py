@@ -0,0 +1,47 @@
+"""
+Tests for loot spawning.  These need Evennia; run them with
+
+    evennia test cardsystem.tests.test_spawning
+"""
+from unittest.mock import MagicMock, patch
+from evennia.utils.test_resources import BaseEvenniaTestCase
+from cardsystem import prototypes, registry, spawning
+
+# card strings of every catalog card with a Loot prototype
+LOOT_CARDS = [cardstring for cardstring in registry.REGISTRY if registry.REGISTRY.get(cardstring).get('Loot')]
+
+
+@patch('evennia.prototypes.prototypes.search_prototype', return_value=[prototypes.CARDOBJ])
+class TestLoot(BaseEvenniaTestCase):
+    def setUp(self):
+        super().setUp()
+        spawning._LOOT.clear()
+
+    def test_catalog_loot_validates(self, search_prototype):
+        self.assertTrue(LOOT_CARDS)
+        for cardstring in LOOT_CARDS:
+            prototype = spawning.loot_prototype(cardstring)
+            self.assertIsNotNone(prototype, cardstring)
+            self.assertEqual(prototype['prototype_parent'], 'card-object')
+        search_prototype.assert_called_with(key='card-object', require_single=True)
+
+    def test_no_loot(self, search_prototype):
+        self.assertIsNone(spawning.loot_prototype('Base_Common_Punch'))
+
+    @patch('cardsystem.spawning.spawner.spawn')
+    @patch('cardsystem.spawning.delay')
+    def test_loot_is_queued(self, delay, spawn, search_prototype):
+        queue = spawning.LootQueue()
+        location = MagicMock()
+        self.assertTrue(queue.add('Base_Common_Rusty Knife', location, source='Goblin'))
+        self.assertTrue(queue.add('Base_Common_Rusty Knife', location, source='Orc'))
+        # both drops share one scheduled flush
+        delay.assert_called_once_with(0, queue.flush)
+        spawn.return_value = [MagicMock(), MagicMock()]
+        self.assertEqual(queue.flush(), spawn.return_value)
+        prototypes_spawned = spawn.call_args[0]
+        self.assertEqual(len(prototypes_spawned), 2)
+        self.assertEqual(prototypes_spawned[0]['location'], location)
+        self.assertEqual(prototypes_spawned[0]['card'], 'Base_Common_Rusty Knife')
+        self.assertEqual(location.msg_contents.call_count, 2)
+        self.assertEqual(queue.flush(), [])
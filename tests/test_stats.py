@@ -0,0 +1,44 @@
+"""
+Tests for the stat deltas.
+"""
+from unittest import TestCase
+from cardsystem import stats
+
+CARDS = ['Base_Common_Punch', 'Base_Common_Simple Club', 'Base_Rare_Dark Urges']
+
+
+class TestStatDeltas(TestCase):
+    def test_card_bonuses(self):
+        self.assertEqual(stats.card_bonuses('Base_Common_Punch'), (('Strength', 1), ('Health', 1)))
+        self.assertEqual(stats.card_bonuses('Base_Shared_Simple Weapon'), ())
+
+    def test_add_and_remove_cards(self):
+        values = stats.new_stats()
+        stats.add_cards(values, CARDS)
+        self.assertEqual(values['Strength'], {'Max': 13, 'Cur': 13, 'Mod': 0})
+        self.assertEqual(values['Health'], {'Max': 9, 'Cur': 9, 'Mod': 0})
+        stats.remove_cards(values, CARDS)
+        self.assertEqual(values, stats.new_stats())
+
+    def test_effects(self):
+        values = stats.new_stats()
+        effects = [{'Stat': 'Strength', 'Amount': 3}, {'Stat': 'Reflexes', 'Amount': -2}]
+        stats.add_effects(values, effects)
+        self.assertEqual(values['Strength']['Mod'], 3)
+        self.assertEqual(values['Reflexes']['Mod'], -2)
+        stats.remove_effects(values, effects[:1])
+        self.assertEqual(values['Strength']['Mod'], 0)
+
+    def test_deltas_match_recompute(self):
+        values = stats.new_stats()
+        effects = [{'Stat': 'Health', 'Amount': 2}]
+        stats.add_cards(values, CARDS)
+        stats.add_effects(values, effects)
+        values['Health']['Cur'] -= 4
+        self.assertEqual(stats.recompute(values, CARDS, effects), values)
+
+    def test_copy_is_detached(self):
+        values = stats.new_stats()
+        copied = stats.copy_stats(values)
+        copied['Health']['Cur'] = 1
+        self.assertEqual(values['Health']['Cur'], stats.BASE_STAT)
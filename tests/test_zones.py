@@ -0,0 +1,56 @@
+"""
+Tests for the card zone blob.
+"""
+from unittest import TestCase
+from cardsystem.zones import CardInterner, CardZones, ZONES
+
+
+class TestCardZones(TestCase):
+    def setUp(self):
+        self.interner = CardInterner()
+        self.zones = CardZones(interner=self.interner)
+        self.zones.set_cards('card_deck', ['Base_Common_Sword', 'Base_Common_Shield', 'Base_Common_Sword'])
+        self.zones.set_cards('card_hand', ['Base_Rare_Fireball'])
+        self.zones.set_cards('card_equipped', ['Base_Uncommon_Armor'])
+
+    def test_round_trip(self):
+        loaded = CardZones.from_bytes(self.zones.to_bytes(), interner=self.interner)
+        for zone in ZONES:
+            self.assertEqual(loaded.cards(zone), self.zones.cards(zone))
+        self.assertFalse(loaded.dirty)
+
+    def test_empty_blob(self):
+        loaded = CardZones.from_bytes(None, interner=self.interner)
+        for zone in ZONES:
+            self.assertEqual(loaded.count(zone), 0)
+        self.assertEqual(CardZones.from_bytes(loaded.to_bytes(), interner=self.interner).cards('card_deck'), [])
+
+    def test_unknown_version(self):
+        blob = bytearray(self.zones.to_bytes())
+        blob[0] = 99
+        with self.assertRaises(ValueError):
+            CardZones.from_bytes(bytes(blob), interner=self.interner)
+
+    def test_moves_mark_dirty(self):
+        self.zones.dirty = False
+        card = self.zones.move('card_deck', 0, 'card_hand')
+        self.assertEqual(card, 'Base_Common_Sword')
+        self.assertTrue(self.zones.dirty)
+        self.assertEqual(self.zones.cards('card_hand'), ['Base_Rare_Fireball', 'Base_Common_Sword'])
+
+    def test_find_and_remove(self):
+        self.assertEqual(self.zones.find('Base_Common_Shield'), ('card_deck', 1))
+        self.assertEqual(self.zones.find('Base_Unknown_Card'), (None, None))
+        # equipped cards are not part of the owned zones
+        self.assertFalse(self.zones.remove('Base_Uncommon_Armor'))
+        self.assertTrue(self.zones.remove('Base_Common_Sword'))
+        self.assertEqual(self.zones.cards('card_deck'), ['Base_Common_Shield', 'Base_Common_Sword'])
+
+    def test_interner_persistence(self):
+        saved = []
+        interner = CardInterner()
+        interner.loader = lambda: ['Base_Rare_Fireball']
+        interner.saver = saved.append
+        self.assertEqual(interner.card_id('Base_Rare_Fireball'), 0)
+        self.assertEqual(interner.card_id('Base_Common_Sword'), 1)
+        self.assertEqual(saved[-1], ('Base_Rare_Fireball', 'Base_Common_Sword'))
@@ -1,134 +1,245 @@
 from evennia import DefaultCharacter, DefaultObject
 import random
-import cardsystem
-from cardsystem import helper
-from evennia.prototypes import spawner
+from cardsystem import ai, catalog, core, helper, registry, spawning, stats
+from cardsystem.effects import EffectStore
+from cardsystem.zones import CardZones, ZONES, INTERNER
+from evennia.server.models import ServerConfig
 from evennia.utils import is_iter
 from collections import defaultdict
 from evennia.utils.utils import list_to_string
 
 
+# Card IDs are shared by every character's zone blob, so the table is persisted server-wide.
+INTERNER.loader = lambda: ServerConfig.objects.conf('cardsystem_card_ids', default=())
+INTERNER.saver = lambda strings: ServerConfig.objects.conf('cardsystem_card_ids', value=strings)
+
+
+ROLE_PLAYER = 'player'
+ROLE_NPC = 'npc'
+_player_typeclasses = None
+
+
+def get_role(obj):
+    """
+    Classify obj as ROLE_PLAYER, ROLE_NPC or None.  Uses the class-level
+    card_role flag (or an isinstance check for the game's own Character
+    typeclass), so it costs the same no matter how many objects exist.
+    """
+    global _player_typeclasses
+    role = getattr(obj, 'card_role', None)
+    if role is None and obj is not None:
+        if _player_typeclasses is None:
+            # imported late, the game's Character may itself build on this module
+            from typeclasses.characters import Character
+            _player_typeclasses = (Character, CardCharacter)
+        if isinstance(obj, _player_typeclasses):
+            role = ROLE_PLAYER
+    return role
+
+
+def is_player(obj):
+    return get_role(obj) == ROLE_PLAYER
+
+
+def is_npc(obj):
+    return get_role(obj) == ROLE_NPC
+
+
 class CardUserMixin(object):
     def at_object_creation(self):
         super(CardUserMixin, self).at_object_creation()
-        self.db.card_deck = []
-        self.db.card_hand = []
-        self.db.card_discard = []
-        self.db.card_played = []
-        self.db.card_effects = {}
-        self.db.stats = {'Strength': {'Max': 10, 'Cur': 10, 'Mod': 0},
-                         'Reflexes': {'Max': 10, 'Cur': 10, 'Mod': 0},
-                         'Health': {'Max': 10, 'Cur': 10, 'Mod': 0},
-                         'Intelligence': {'Max': 10, 'Cur': 10, 'Mod': 0},
-                         }
+        self.db.card_zones = CardZones().to_bytes()
+        self.db.card_effects = EffectStore().to_dict()
+        self.db.stats = stats.new_stats()
+
+    @property
+    def zones(self):
+        """
+        The character's card zones, detached from the database.  They are
+        decoded from the card_zones blob on first use and kept in memory;
+        changes are written back by flush_zones.  Any legacy list attributes
+        (old saves, prototype card_deck/card_equipped) are migrated into the
+        blob.
+        """
+        zones = self.ndb.card_zones
+        if zones is None:
+            zones = CardZones.from_bytes(self.attributes.get('card_zones'))
+            legacy = [zone for zone in ZONES if self.attributes.has(zone)]
+            for zone in legacy:
+                zones.extend(zone, self.attributes.get(zone) or [])
+            self.ndb.card_zones = zones
+            if legacy:
+                # persist the migrated blob before the old attributes go away
+                self.flush_zones()
+                for zone in legacy:
+                    self.attributes.remove(zone)
+        return zones
+
+    @property
+    def effects(self):
+        """
+        The character's EffectStore.  Like the zones it is loaded from the
+        card_effects Attribute on first use, kept in memory and written back
+        by flush_effects.
+        """
+        effects = self.ndb.card_effects
+        if effects is None:
+            effects = EffectStore.from_dict(self.attributes.get('card_effects'))
+            self.ndb.card_effects = effects
+        return effects
+
+    def flush_zones(self):
+        """Write the in-memory zones back to the card_zones Attribute, if changed."""
+        zones = self.ndb.card_zones
+        if zones is not None and zones.dirty:
+            self.db.card_zones = zones.to_bytes()
+            zones.dirty = False
+
+    def flush_effects(self):
+        """Write the in-memory effects back to the card_effects Attribute, if changed."""
+        effects = self.ndb.card_effects
+        if effects is not None and effects.dirty:
+            self.db.card_effects = effects.to_dict()
+            effects.dirty = False
+
+    def flush_outside_combat(self):
+        """
+        Write back changed zones and effects right away unless a combat
+        handler is attached, which flushes them once per turn instead.
+        Keeps them in step with db.stats, which is written immediately.
+        """
+        if not self.ndb.combat_handler:
+            self.flush_zones()
+            self.flush_effects()
+
+    def at_server_reload(self):
+        super(CardUserMixin, self).at_server_reload()
+        self.flush_zones()
+        self.flush_effects()
+
+    def at_server_shutdown(self):
+        super(CardUserMixin, self).at_server_shutdown()
+        self.flush_zones()
+        self.flush_effects()
+
+    def card_state(self):
+        """
+        Build a core.CombatantState for this character.  Stats are copied;
+        the zones and effects are the live in-memory ones.
+        """
+        self.refresh_stats()
+        return core.CombatantState(self.id, self.key, stats.copy_stats(self.db.stats), self.zones,
+                                   self.effects)
+
+    def apply_card_state(self, state, events=(), check=True):
+        """
+        Write a CombatantState produced by the core rules back to this
+        character and deliver its private messages.  With check=False the
+        caller is responsible for calling check_stats afterwards.
+        """
+        self.ndb.card_zones = state.zones
+        self.ndb.card_effects = state.effects
+        chandler = self.ndb.combat_handler
+        for event in events:
+            if event['event'] == 'msg' and event['actor'] == self.id:
+                if chandler:
+                    chandler.msg(self, event['text'])
+                else:
+                    self.msg(event['text'])
+        if state.stats != self.db.stats:
+            self.db.stats = state.stats
+            if check:
+                self.check_stats()
+
+    def _run_core(self, rule, *args, **kwargs):
+        state = self.card_state()
+        events = rule(state, *args, **kwargs)
+        self.apply_card_state(state, events)
+        self.flush_outside_combat()
 
     def shuffle(self, withdiscard=True):
-        if withdiscard:
-            self.db.card_deck.extend(self.db.card_discard)
-            self.db.card_discard = []
-        random.shuffle(self.db.card_deck)
+        self._run_core(core.shuffle, withdiscard=withdiscard)
 
     @property
     def deck(self):
-        return self.db.card_deck
+        return self.zones.cards('card_deck')
 
     @property
     def hand(self):
-        return self.db.card_hand
+        return self.zones.cards('card_hand')
 
     @property
     def played(self):
-        return self.db.card_played
+        return self.zones.cards('card_played')
 
     @property
     def discardpile(self):
-        return self.db.card_discard
+        return self.zones.cards('card_discard')
+
+    @property
+    def equipped(self):
+        return self.zones.cards('card_equipped')
 
     @property
     def defense(self):
-        basedefense = self.db.stats['Strength']['Cur']
-        defense = int(basedefense)
-        for card in self.db.card_played:
-            carddata = helper.get_card_data(card)
-            if carddata.get("DefenseMult"):
-                defense = defense * carddata['DefenseMult']
-        defense = int(defense/10)
-        return defense
+        self.refresh_stats()
+        return core.defense_value(self.db.stats, self.zones)
 
     def get_stat(self, stat):
+        self.refresh_stats()
         return self.db.stats[stat]['Cur'] + self.db.stats[stat]['Mod'], self.db.stats[stat]['Max']
 
     def fill_deck(self):
         """ Remove this """
-        for i in range(20):
-            rarity = random.choice(['Common', 'Common', 'Common', 'Uncommon', 'Common', 'Common', 'Common', 'Uncommon', 'Common', 'Common', 'Common', 'Rare'])
-            cardtitle = random.choice(list(cardsystem.CARDS['Base'][rarity].keys()))
-            card = f'Base_{rarity}_{cardtitle}'
-            self.db.card_deck.append(card)
+        added = catalog.rarity_sampler('Base', catalog.FILL_RARITY_WEIGHTS).samples(20)
+        self.zones.extend('card_deck', added)
+        self.flush_zones()
+        self.update_stats(cards_in=added)
 
     def draw(self, cardcount):
-        for i in range(0, cardcount):
-            if len(self.db.card_deck) == 0:
-                self.msg('Shuffling discard back into deck.')
-                self.shuffle()
-            self.db.card_hand.append(self.db.card_deck.pop(0))
+        self._run_core(core.draw, cardcount)
 
     def discard(self, index):
-        self.db.card_discard.append(self.db.card_hand.pop(index))
+        self._run_core(core.discard, index)
 
     def play(self, index, fromzone='card_hand'):
-        from_zone = self.attributes.get(fromzone)
-        carddata = helper.get_card_data(from_zone[index])
-        if carddata['Type'] in ['Attack', 'Defend', 'Buff', 'Debuff']:
-            # Insert card effects here
-            self.db.card_discard.append(from_zone.pop(index))
-        else:
-            for index in range(0, len(self.db.card_played)):
-                played_carddata = helper.get_card_data(self.db.card_played[index])
-                if played_carddata['Type'] == carddata['Type']:
-                    self.msg(f"Removing {played_carddata['Name']} from play.")
-                    self.leaveplay(index)
-            self.msg(f'Playing {carddata["Name"]}')
-            self.db.card_played.append(from_zone.pop(index))
-        if carddata.get('Create', None):
-            for card in carddata['Create']:
-                self.db.card_deck.append(card)
-            self.shuffle(withdiscard=False)
-            self.calculate_stats()
-            self.check_stats()
+        self._run_core(core.play, index, fromzone=fromzone)
 
     def leaveplay(self, index):
-        carddata = helper.get_card_data(self.db.card_played[index])
-        if carddata.get('Create', None):
-            for card in carddata['Create']:
-                self.remove_card(card)
-        self.db.card_discard.append(self.db.card_played.pop(index))
-        self.calculate_stats()
-        self.check_stats()
+        self._run_core(core.leaveplay, index)
 
     def calculate_stats(self):
-        for key in self.db.stats.keys():
-            stat = self.db.stats[key]
-            statdif = stat['Max'] - stat['Cur']
-            self.db.stats[key]['Max'] = 10
-            self.db.stats[key]['Cur'] = 10 - statdif
-            self.db.stats[key]['Mod'] = 0
-            for card in self.all_cards():
-                cardinfo = helper.get_card_data(card)
-                cardmod = cardinfo.get(key, 0)
-                if cardmod:
-                    self.db.stats[key]['Max'] += cardmod
-                    self.db.stats[key]['Cur'] += cardmod
-            for effect in self.db.card_effects.values():
-                if effect['Stat'] == key:
-                    self.db.stats[key]['Mod'] += effect['Amount']
+        """
+        Rebuild stats from every owned card and effect.  Stats are normally
+        kept current by update_stats; this is the verification path.
+        """
+        newstats = stats.recompute(self.db.stats, self.all_cards(), self.effects.values())
+        if newstats != self.db.stats:
+            self.db.stats = newstats
+
+    def refresh_stats(self):
+        """
+        Recompute stats the first time they are used under a new catalog
+        version, since the stat bonuses of owned cards may have changed.
+        """
+        if self.ndb.catalog_version != registry.REGISTRY.version:
+            self.ndb.catalog_version = registry.REGISTRY.version
+            self.calculate_stats()
+
+    def update_stats(self, cards_in=(), cards_out=(), effects_in=(), effects_out=()):
+        """
+        Apply the stat contributions of cards entering or leaving the owned
+        zones and of effects being added or expiring, in one write.
+        """
+        statblock = stats.copy_stats(self.db.stats)
+        stats.add_cards(statblock, cards_in)
+        stats.remove_cards(statblock, cards_out)
+        stats.add_effects(statblock, effects_in)
+        stats.remove_effects(statblock, effects_out)
+        self.db.stats = statblock
 
     def modify_stat(self, stat, amount):
-        if stat in self.db.stats.keys():
-            mystat = self.db.stats[stat]
-            mystat['Cur'] += amount
-            mystat['Cur'] = min(mystat['Max'], mystat['Cur'])
-            self.check_stats()
+        self._run_core(core.modify_stat, stat, amount)
 
     def check_stats(self):
         healthcur, healthmax = self.get_stat('Health')
@@ -142,13 +253,12 @@ class CardUserMixin(object):
         self.location.msg_contents(f'GAME: {self.key} dies.  If you\'re seeing this, this typeclass has not been set up properly.')
 
     def all_cards(self):
-        allcards = list(self.db.card_deck) + list(self.db.card_hand) + list(self.db.card_discard) + list(self.db.card_played)
-        return allcards
+        return self.zones.all_cards()
 
     def remove_card(self, cardstring):
-        cardpool, index = helper.find_card(self, cardstring, pools=['card_deck', 'card_hand', 'card_discard', 'card_played'])
-        if cardpool:
-            self.attributes.get(cardpool).remove(cardstring)
+        if self.zones.remove(cardstring):
+            self.update_stats(cards_out=[cardstring])
+            self.flush_outside_combat()
             return True
         return False
 
@@ -204,31 +314,20 @@ class CardUserMixin(object):
     def addeffect(self, stat, amount, duration=-1, source=None):
         if not source:
             source = self
-        id = random.randint(0, 10000)
-        self.db.card_effects[id] = {'Stat': stat, 'Amount': amount, 'Duration': duration, 'Source': source}
-        self.calculate_stats()
-        self.check_stats()
+        self._run_core(core.add_effect, stat, amount, duration=duration, source=source)
 
     def countdowneffects(self):
-        for effectkey in self.db.card_effects.keys():
-            effect = self.db.card_effects[effectkey]
-            if effect['Duration'] > 0:
-                effect['Duration'] -= 1
-                if effect['Duration'] == 0:
-                    del self.db.card_effects[effectkey]
-        self.calculate_stats()
-        self.check_stats()
+        self._run_core(core.countdown_effects)
 
     def cleareffects(self):
-        self.db.card_effects = {}
-        self.calculate_stats()
-        self.check_stats()
-
+        self._run_core(core.clear_effects)
 
 class CardCharacter(CardUserMixin, DefaultCharacter):
     """
 
     """
+    card_role = ROLE_PLAYER
+
     def at_object_creation(self):
         super(CardCharacter, self).at_object_creation()
         self.db.hand_size = 4
@@ -253,20 +352,25 @@ class NPC(CardUserMixin, DefaultCharacter):
     """
 
     """
+    card_role = ROLE_NPC
+    # name of the cardsystem.ai engine choosing this NPC's plays; db.ai_engine overrides it
+    ai_engine = 'lookahead'
+
     def at_object_creation(self):
         super(NPC, self).at_object_creation()
         self.db.card_combatok = True
         self.db.hand_size = 3
         self.db.death_message = 'died.'
-        self.db.card_equipped = []
 
     def basetype_posthook_setup(self):
         super(NPC, self).basetype_posthook_setup()
-        self.execute_cmd('say Test')
-        for count in range(0, len(self.db.card_equipped)):
-            self.play(0, fromzone='card_equipped')
-        self.calculate_stats()
-        self.shuffle()
+        # NPCs from cardsystem.spawning.spawn_npcs arrive prepared, with no card lists
+        if any(self.attributes.has(zone) for zone in ZONES):
+            state = self.card_state()
+            core.prepare(state)
+            self.apply_card_state(state)
+            self.flush_zones()
+            self.flush_effects()
 
 
     def consider_invite(self):
@@ -282,64 +386,48 @@ class NPC(CardUserMixin, DefaultCharacter):
 
 
     def spawn_loot(self, cardstring):
-        carddata = helper.get_card_data(cardstring)
-        if loot := carddata.get("Loot"):
-            loot['location'] = self
-            spawner.spawn(loot)
+        """Queue the card's loot to drop where this NPC stands."""
+        spawning.LOOT.add(cardstring, self.location, source=self.key)
 
 
     def die(self):
-        for i in range(0, len(self.db.card_hand)):
+        # leaveplay and shuffle can run check_stats, which would call die again
+        if self.ndb.dying:
+            return
+        self.ndb.dying = True
+        for i in range(0, len(self.hand)):
             self.discard(0)
-        for i in range(0, len(self.db.card_played)):
+        for i in range(0, len(self.played)):
             self.leaveplay(0)
         self.shuffle()
-        self.spawn_loot(self.db.card_deck[0])
+        self.spawn_loot(self.deck[0])
         self.for_contents(self.drop)
         if is_iter(self.db.death_message):
             death_message = random.choice(self.db.death_message)
         else:
             death_message = self.db.death_message
         self.location.msg_contents(f'{self.key} {death_message}')
-        self.delete()
+        spawning.recycle(self)
 
     def drop(self, obj, **kwargs):
         obj.move_to(self.location, quiet=True)
         self.location.msg_contents(f'{self.key} dropped {obj.get_numbered_name(1, self)[0]}.')
 
     def combat_action(self):
-        drawcount = self.db.hand_size - len(self.db.card_hand)
+        drawcount = self.db.hand_size - len(self.hand)
         self.draw(drawcount)
         chandler = self.ndb.combat_handler
         group = chandler.get_groups(self)
-        card = self.db.card_hand[0] # Add logic here to choose card.
-        card_details = helper.get_card_data(card)
-
-
-        if card_details['Type'] in ['Attack', 'Debuff']:
-            if len(group['Foe']) == 1:
-                target = group['Foe']
-                chandler.add_action(card, self, target)
-            elif card_details.get('Target') == 'Group':
-                target = group['Foe']
-                chandlder.add_action(card, self, target)
-            else:
-                target = [group['Foe'][0]] # Add logic here to choose target.
-                chandler.add_action(card, self, target)
-        elif card_details['Type'] in ['Heal', 'Buff']:
-            if len(group['Friend']) == 1:
-                target = group['Friend']
-                chandler.add_action(card, self, target)
-            elif card_details.get('Target') == 'Group':
-                target = group['Friend']
-                chandler.add_action(card, self, target)
-            else:
-                target = [group['Friend'][0]] # Add logic here to choose target.
-                chandler.msg_all(target)
-                chandler.add_action(card, self, target)
-                chandler.msg_all(target)
-
+        combatants = chandler.characters
+        # only the combatants the engine looks at are turned into states
+        states = ai.StateMap(lambda key: combatants[key].card_state())
+        engine = ai.get_engine(self.db.ai_engine or self.ai_engine)
+        card, targets = engine.decide(self.id, states,
+                                      [character.id for character in group['Friend']],
+                                      [character.id for character in group['Foe']])
+        if card:
+            chandler.add_action(card, self, [combatants[target] for target in targets])
         else:
-            target = [self]
-            chandler.add_action(card, self, target)
-        chandler.check_end_turn()
\ No newline at end of file
+            # passing still uses up the turn, or the turn would wait on this NPC
+            chandler.add_action(None, self, [])
+        chandler.check_end_turn()
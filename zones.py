@@ -0,0 +1,215 @@
+"""
+Compact card zone storage.
+
+Card strings are interned to small integer IDs and each character's zones
+(deck, hand, discard, played, equipped) are stored as `array('H')` buffers,
+serialized together into a single bytes blob.  `CardZones` translates back
+to card strings for the string-based APIs.
+"""
+from array import array
+from collections import deque
+import random
+import sys
+
+ZONES = ('card_deck', 'card_hand', 'card_discard', 'card_played', 'card_equipped')
+# Zones whose cards belong to the character's deck (and count towards stats).
+OWNED_ZONES = ZONES[:4]
+BLOB_VERSION = 1
+
+
+class CardInterner(object):
+    """
+    Maps card strings to integer IDs.  IDs are never reused or reordered, so
+    blobs stay valid when the catalog changes.  `loader` and `saver` may be
+    set to persist the table; `loader` is called on first use.
+    """
+    def __init__(self, strings=()):
+        self.loader = None
+        self.saver = None
+        self._loaded = False
+        self._strings = []
+        self._ids = {}
+        self._extend(strings)
+
+    def _extend(self, strings):
+        for cardstring in strings:
+            if cardstring not in self._ids:
+                self._ids[cardstring] = len(self._strings)
+                self._strings.append(cardstring)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._loaded = True
+            if self.loader:
+                stored = list(self.loader() or [])
+                # Stored IDs take precedence over anything interned before loading.
+                pending = [cardstring for cardstring in self._strings if cardstring not in stored]
+                self._strings = []
+                self._ids = {}
+                self._extend(stored + pending)
+
+    def card_id(self, cardstring):
+        self._ensure_loaded()
+        card_id = self._ids.get(cardstring)
+        if card_id is None:
+            card_id = len(self._strings)
+            if card_id > 0xFFFF:
+                raise OverflowError('Card ID table is full.')
+            self._ids[cardstring] = card_id
+            self._strings.append(cardstring)
+            if self.saver:
+                self.saver(tuple(self._strings))
+        return card_id
+
+    def lookup(self, cardstring):
+        """Return the ID for cardstring without interning it, or None."""
+        self._ensure_loaded()
+        return self._ids.get(cardstring)
+
+    def card_string(self, card_id):
+        self._ensure_loaded()
+        return self._strings[card_id]
+
+    def strings(self):
+        """Every card string that has been given an ID."""
+        self._ensure_loaded()
+        return tuple(self._strings)
+
+
+INTERNER = CardInterner()
+
+
+def _new_zone(zone, card_ids=()):
+    # The deck is drawn from the front, so it is kept as a deque.
+    if zone == 'card_deck':
+        return deque(card_ids)
+    return list(card_ids)
+
+
+class CardZones(object):
+    """
+    A character's card zones, detached from the database.
+
+    Zones are held as plain Python structures of card IDs while in memory and
+    only encoded to the `array('H')` blob by `to_bytes`.  Every change sets
+    `dirty`, so the owner can write the blob back once per command or turn.
+    """
+    def __init__(self, interner=None):
+        self.interner = interner or INTERNER
+        self._zones = {zone: _new_zone(zone) for zone in ZONES}
+        self.dirty = False
+
+    def copy(self):
+        zones = CardZones(interner=self.interner)
+        zones._zones = {zone: _new_zone(zone, cards) for zone, cards in self._zones.items()}
+        zones.dirty = self.dirty
+        return zones
+
+    @classmethod
+    def from_bytes(cls, blob, interner=None):
+        zones = cls(interner=interner)
+        if not blob:
+            return zones
+        data = array('H')
+        data.frombytes(blob)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        version, zonecount = data[0], data[1]
+        if version != BLOB_VERSION:
+            raise ValueError(f'Unknown card zone blob version {version}.')
+        offset = 2 + zonecount
+        for zone, count in zip(ZONES, data[2:offset]):
+            zones._zones[zone] = _new_zone(zone, data[offset:offset + count])
+            offset += count
+        return zones
+
+    def to_bytes(self):
+        data = array('H', [BLOB_VERSION, len(ZONES)])
+        data.extend(len(self._zones[zone]) for zone in ZONES)
+        for zone in ZONES:
+            data.extend(self._zones[zone])
+        if sys.byteorder == 'big':
+            data.byteswap()
+        return data.tobytes()
+
+    def ids(self, zone):
+        return self._zones[zone]
+
+    def cards(self, zone):
+        card_string = self.interner.card_string
+        return [card_string(card_id) for card_id in self._zones[zone]]
+
+    def count(self, zone):
+        return len(self._zones[zone])
+
+    def set_cards(self, zone, cardstrings):
+        card_id = self.interner.card_id
+        self._zones[zone] = _new_zone(zone, (card_id(cardstring) for cardstring in cardstrings))
+        self.dirty = True
+
+    def append(self, zone, cardstring):
+        self._zones[zone].append(self.interner.card_id(cardstring))
+        self.dirty = True
+
+    def extend(self, zone, cardstrings):
+        card_id = self.interner.card_id
+        self._zones[zone].extend(card_id(cardstring) for cardstring in cardstrings)
+        self.dirty = True
+
+    def get(self, zone, index):
+        return self.interner.card_string(self._zones[zone][index])
+
+    def _pop_id(self, zone, index):
+        cards = self._zones[zone]
+        if index == 0 and zone == 'card_deck':
+            card_id = cards.popleft()
+        else:
+            card_id = cards[index]
+            del cards[index]
+        self.dirty = True
+        return card_id
+
+    def pop(self, zone, index=-1):
+        return self.interner.card_string(self._pop_id(zone, index))
+
+    def move(self, fromzone, index, tozone):
+        """Move the card at index in fromzone to the end of tozone."""
+        card_id = self._pop_id(fromzone, index)
+        self._zones[tozone].append(card_id)
+        return self.interner.card_string(card_id)
+
+    def move_all(self, fromzone, tozone):
+        self._zones[tozone].extend(self._zones[fromzone])
+        self._zones[fromzone] = _new_zone(fromzone)
+        self.dirty = True
+
+    def find(self, cardstring, zones=OWNED_ZONES):
+        """Return (zone, index) of the first copy of cardstring, or (None, None)."""
+        card_id = self.interner.lookup(cardstring)
+        if card_id is None:
+            return None, None
+        for zone in zones:
+            try:
+                return zone, self._zones[zone].index(card_id)
+            except ValueError:
+                continue
+        return None, None
+
+    def remove(self, cardstring, zones=OWNED_ZONES):
+        zone, index = self.find(cardstring, zones)
+        if zone:
+            self._pop_id(zone, index)
+            return True
+        return False
+
+    def shuffle(self, zone, rng=random):
+        cards = list(self._zones[zone])
+        rng.shuffle(cards)
+        self._zones[zone] = _new_zone(zone, cards)
+        self.dirty = True
+
+    def all_cards(self, zones=OWNED_ZONES):
+        cards = []
+        for zone in zones:
+            cards.extend(self.cards(zone))
+        return cards